@@ -2,40 +2,277 @@
 Simple autofix module with placeholder vulnerability fixing function.
 """
 
+import atexit
+import fcntl
+import hashlib
+import io
 import subprocess
 import tempfile
+import threading
 import shutil
 import os
 import json
 import logging
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
-import google.generativeai as genai
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import orjson
 from tenacity import (
     retry,
     stop_after_attempt,
-    wait_exponential,
+    wait_random_exponential,
     retry_if_exception_type,
     before_sleep_log,
 )
 
+from . import rules
+from .patching import apply_unified_diff
 from .git_operations import commit_and_push_changes, create_pull_request
 
 # Setup logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 
+def _configure_logging() -> None:
+    """
+    Send log records through a queue so formatting and stream I/O happen on a
+    listener thread instead of the threads running fixes.
+
+    Like logging.basicConfig, this does nothing if the root logger already
+    has handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stream_handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+_configure_logging()
+
+# Vulnerability currently being fixed by this thread, used to tag log records
+_current_vuln_id: ContextVar[str] = ContextVar("autofix_vuln_id", default="")
+
+
+class _VulnerabilityLogFilter(logging.Filter):
+    """Prefix log records with the vulnerability being fixed so concurrent fixes stay attributable."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        vuln_id = _current_vuln_id.get()
+        if vuln_id:
+            record.msg = f"[{vuln_id}] {record.msg}"
+        return True
+
+
+logger.addFilter(_VulnerabilityLogFilter())
+
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
 REPO_URL = "https://github.com/SamuelLess/hackatum-k8s-flux.git"
+REPO_BRANCH = "main"
+
+# Partial clone filter for the repository cache; the context only uses files
+# up to 5KB. Set REPO_CLONE_FILTER to an empty string to clone all blobs.
+REPO_CLONE_FILTER = os.getenv("REPO_CLONE_FILTER", "blob:limit=5k")
+
+# Scratch data goes to disk instead once the scratch directory has less than this free
+SCRATCH_MIN_FREE_BYTES = int(os.getenv("CARAKUBE_TMP_MIN_FREE_MB", "64")) * 1024 * 1024
+DISK_SCRATCH_DIR = Path(tempfile.gettempdir())
+
+
+def _has_room(directory: Path) -> bool:
+    """Check whether a scratch directory has at least SCRATCH_MIN_FREE_BYTES free."""
+    try:
+        return shutil.disk_usage(directory).free >= SCRATCH_MIN_FREE_BYTES
+    except OSError:
+        return False
+
+
+# Clones and worktrees are short-lived scratch data; keep them in memory (tmpfs) when
+# available and not already full. Set CARAKUBE_TMP to use another directory.
+_SHM_DIR = Path("/dev/shm")
+SCRATCH_DIR = Path(
+    os.getenv("CARAKUBE_TMP")
+    or (
+        _SHM_DIR
+        if _SHM_DIR.is_dir() and ((_SHM_DIR / "carakube-autofix-cache").is_dir() or _has_room(_SHM_DIR))
+        else DISK_SCRATCH_DIR
+    )
+)
+
+# Long-lived clone shared by all fixes; each fix works in its own worktree
+REPO_CACHE_DIR = SCRATCH_DIR / "carakube-autofix-cache"
+REPO_CACHE_LOCK_FILE = REPO_CACHE_DIR.with_name("carakube-autofix-cache.lock")
+_repo_cache_thread_lock = threading.Lock()
+
+# Fixes started within this many seconds of the last refresh reuse the cache without asking the remote
+REPO_REFRESH_INTERVAL_SECONDS = 30
+REPO_REFRESH_STAMP = "carakube-refreshed"
+
+# Never block on an interactive credential prompt
+GIT_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+# Concurrency limits when fixing several vulnerabilities at once
+MAX_FIX_WORKERS = 4
+
+# Finished worktrees are kept for reuse by later fixes of this process while the
+# cache has at most this many worktrees in total, counted over all API worker
+# processes; checking out another commit in an existing worktree is cheaper than
+# adding a new one. Each worktree is a full checkout, so shm_size in
+# docker-compose.yml has to fit the clone plus this many worktrees plus the ones
+# in use (MAX_FIX_WORKERS per worker process). New worktrees go to disk when
+# the scratch directory runs low anyway.
+WORKTREE_POOL_SIZE = MAX_FIX_WORKERS
+_idle_worktrees: List[Path] = []
+MAX_CONCURRENT_GEMINI_CALLS = 2
+_gemini_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_GEMINI_CALLS)
+
+# Gemini SDK, imported and configured on first use: it pulls in gRPC and protobuf,
+# which every importer of this module would otherwise pay for even when nothing is fixed
+_genai = None
+_gemini_models: Dict[str, Any] = {}
+_gemini_models_lock = threading.Lock()
+
+# Generated patches are reused for identical prompts (same vulnerability, same repository content)
+PATCH_CACHE_DIR = Path(tempfile.gettempdir()) / "carakube-patch-cache"
+PATCH_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Collected files per commit; the tree is identical for all fixes against the same HEAD.
+# Only the newest commits are kept, older ones are never asked for again.
+REPO_FILES_CACHE_SIZE = 2
+_repo_files_cache: Dict[str, List[Tuple[str, str]]] = {}
+
+# Upper bound for the repository context in the patch prompt (roughly 15k tokens)
+MAX_CONTEXT_CHARS = 60_000
 
+# Files naming the affected resource that are sent to Gemini, plus their directory siblings
+CONTEXT_TOP_FILES = 20
+_repo_files_cache_lock = threading.Lock()
 
-def get_gemini_model(response_schema: Dict[str, Any] = None) -> Any:
+# Native rm is used for repository cleanup when present (not on Windows)
+RM_BINARY = shutil.which("rm")
+
+
+# Patch candidates requested per Gemini call; the first one that applies is used
+PATCH_CANDIDATE_COUNT = 2
+
+# Static part of the patch prompt
+PATCH_PROMPT_PREAMBLE = """You are a security expert fixing Kubernetes vulnerabilities.
+
+TASK: Generate a unified diff patch to fix the vulnerability described below.
+
+RULES:
+1. Output ONLY valid unified diff format (use --- and +++ headers, @@ hunks)
+2. Make MINIMAL changes - only what's needed to fix the vulnerability
+3. NO comments, NO explanations - pure patch content only
+4. For RBAC wildcards: replace "*" with specific resource names (e.g., "customresourcedefinitions.apiextensions.k8s.io")
+5. For resource limits: add CPU/memory limits to containers
+6. For security: add runAsNonRoot, capabilities, securityContext
+7. Ensure YAML indentation is EXACT and correct
+8. The line numbers shown are for reference - your patch should use standard unified diff format without line numbers
+
+EXAMPLES:
+RBAC fix: Change "resources: ['*']" to "resources: ['customresourcedefinitions']"
+Limits fix: Add "resources: {limits: {cpu: '100m', memory: '128Mi'}}"
+
+Repository files are shown with line numbers in the format "LINE_NUMBER|content".
+Use these line numbers to understand the file structure and generate accurate patches.
+"""
+
+# Structured output schema forcing a valid patch format
+PATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "patch": {
+            "type": "string",
+            "description": "A valid unified diff patch that can be applied with 'patch -p1'. Must start with '---' and contain '+++' and '@@' markers."
+        },
+        "file_path": {
+            "type": "string",
+            "description": "The relative path to the file being patched"
+        },
+        "summary": {
+            "type": "string",
+            "description": "Brief one-line summary of the fix"
+        }
+    },
+    "required": ["patch", "file_path", "summary"]
+}
+
+# Structured output schema for fixing several vulnerabilities with one call
+BATCH_PATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "fixes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "vulnerability_id": {
+                        "type": "string",
+                        "description": "The id of the vulnerability this patch fixes"
+                    },
+                    "patch": PATCH_SCHEMA["properties"]["patch"],
+                    "summary": PATCH_SCHEMA["properties"]["summary"]
+                },
+                "required": ["vulnerability_id", "patch", "summary"]
+            }
+        }
+    },
+    "required": ["fixes"]
+}
+
+# Structured output schema for the pull request description
+DESCRIPTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {
+            "type": "string",
+            "description": "A concise title summarizing the security fix"
+        },
+        "problem_explanation": {
+            "type": "string",
+            "description": "A clear explanation of why this was a security issue, written for humans. Should explain the risk and impact."
+        },
+        "fix_explanation": {
+            "type": "string",
+            "description": "A clear explanation of how the fix addresses the problem, written for humans. Should explain what changes were made and why they solve the issue."
+        },
+        "technical_details": {
+            "type": "string",
+            "description": "Technical details about the specific changes made in the patch"
+        }
+    },
+    "required": ["title", "problem_explanation", "fix_explanation", "technical_details"]
+}
+
+
+def get_gemini_model(response_schema: Dict[str, Any] = None, candidate_count: int = None) -> Any:
     """
-    Create and configure a Gemini model instance.
+    Get a configured Gemini model instance.
+
+    The SDK is imported and configured on the first call, and one model is
+    kept per response schema, so the SDK's HTTP session is reused across calls.
     
     Args:
         response_schema: Optional JSON schema for structured output
+        candidate_count: Optional number of response candidates to generate
         
     Returns:
         Configured GenerativeModel instance
@@ -43,213 +280,889 @@ def get_gemini_model(response_schema: Dict[str, Any] = None) -> Any:
     Raises:
         ValueError: If API key is not set
     """
-    # Get API key from environment
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY environment variable not set")
-    
-    # Configure Gemini
-    genai.configure(api_key=api_key)
-    
-    # Build configuration
-    config = {}
-    if response_schema:
-        config["response_mime_type"] = "application/json"
-        config["response_schema"] = response_schema
-    
-    # Create and return model
-    return genai.GenerativeModel('gemini-2.5-flash', generation_config=config if config else None)
+    global _genai
+
+    model_key = json.dumps([response_schema, candidate_count], sort_keys=True)
+    with _gemini_models_lock:
+        model = _gemini_models.get(model_key)
+        if model is not None:
+            return model
+
+        if _genai is None:
+            # Get API key from environment
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY environment variable not set")
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _genai = genai
+
+        # Build configuration
+        config = {}
+        if response_schema:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = response_schema
+        if candidate_count:
+            config["candidate_count"] = candidate_count
+
+        model = _genai.GenerativeModel(GEMINI_MODEL, generation_config=config if config else None)
+        _gemini_models[model_key] = model
+        return model
+
+
+class TransientGeminiError(Exception):
+    """A Gemini call failed for a reason that may go away on retry (rate limit, server error, timeout)."""
+
+
+def _is_transient_gemini_error(error: Exception) -> bool:
+    """Check whether a Gemini SDK error is worth retrying."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServerError,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.RetryError,
+    ))
+
+
+def _generate_content(model: Any, prompt: str) -> Any:
+    """
+    Call Gemini, bounded to respect the API quota under concurrent fixes.
+
+    Raises:
+        TransientGeminiError: If the call failed in a way that may succeed on retry
+    """
+    try:
+        with _gemini_semaphore:
+            return model.generate_content(prompt)
+    except Exception as e:
+        if _is_transient_gemini_error(e):
+            raise TransientGeminiError(f"Gemini call failed: {e}") from e
+        raise
+
+
+# Only transient failures are retried; jittered backoff keeps concurrent fixes from
+# hitting the shared quota again in lockstep. Bad keys and invalid output fail at once.
+_gemini_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    retry=retry_if_exception_type(TransientGeminiError),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
+)
+
 
+def _git(repo_dir: Path, *args: str) -> str:
+    """
+    Run a git command inside a repository.
+
+    Args:
+        repo_dir: Path to the repository (or worktree) to run the command in
+        *args: Arguments passed to git
+
+    Returns:
+        The command's stdout with surrounding whitespace stripped
 
-def clone_repo() -> Path:
+    Raises:
+        RuntimeError: If the git command fails
     """
-    Clone the repository into a temporary folder with timestamp.
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=repo_dir,
+            check=True,
+            capture_output=True,
+            text=True,
+            env=GIT_ENV
+        )
+    except subprocess.CalledProcessError as e:
+        error_msg = f"Git command failed:\nCommand: {' '.join(e.cmd)}\nReturn code: {e.returncode}\nStdout: {e.stdout}\nStderr: {e.stderr}"
+        raise RuntimeError(error_msg) from e
+    return result.stdout.strip()
+
+
+@contextmanager
+def _repo_cache_lock() -> Iterator[None]:
+    """
+    Serialize access to the repository cache.
+
+    The API runs several uvicorn worker processes that share the cache
+    directory, so the thread lock is paired with a file lock.
+    """
+    with _repo_cache_thread_lock:
+        REPO_CACHE_DIR.parent.mkdir(parents=True, exist_ok=True)
+        with open(REPO_CACHE_LOCK_FILE, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def clone_repo(repo_dir: Path) -> Path:
+    """
+    Clone the repository into the given folder.
     
+    Args:
+        repo_dir: Path to clone the repository into
+
     Returns:
         Path to the cloned repository
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    tmp_base = Path(tempfile.gettempdir())
-    repo_dir = tmp_base / f"hackatum-k8s-flux_{timestamp}"
-    
+    # Only the current tree is needed to generate a patch, so skip history and tags.
+    # Pushing a new branch from a shallow clone works with modern git. Files
+    # are read from the object database, and worktrees provide the checkouts.
+    clone_cmd = ["git", "-c", "protocol.version=2", "clone", "--depth=1", "--single-branch", "--no-tags", "--no-checkout"]
+    if REPO_CLONE_FILTER:
+        # Partial clone: larger blobs are only downloaded once something needs them
+        clone_cmd.append(f"--filter={REPO_CLONE_FILTER}")
+    clone_cmd += [REPO_URL, str(repo_dir)]
     try:
         subprocess.run(
-            ["git", "clone", REPO_URL, str(repo_dir)],
+            clone_cmd,
             check=True,
             capture_output=True,
-            text=True
+            text=True,
+            env=GIT_ENV
         )
         return repo_dir
     except subprocess.CalledProcessError as e:
-        error_msg = f"Failed to clone repository:\nCommand: git clone {REPO_URL} {repo_dir}\nReturn code: {e.returncode}\nStdout: {e.stdout}\nStderr: {e.stderr}"
+        error_msg = f"Failed to clone repository:\nCommand: {' '.join(clone_cmd)}\nReturn code: {e.returncode}\nStdout: {e.stdout}\nStderr: {e.stderr}"
         raise RuntimeError(error_msg) from e
 
 
-def cleanup_repo(repo_dir: Path) -> None:
+def _refresh_repo_cache() -> None:
+    """
+    Bring the repository cache up to date with the remote branch.
+
+    Clones the repository on first use; afterwards only the new commits are
+    fetched. A cache refreshed less than REPO_REFRESH_INTERVAL_SECONDS ago is
+    used as is, and the fetch is skipped when the remote branch hasn't moved.
+    Must be called with the repository cache lock held.
+    """
+    stamp_file = REPO_CACHE_DIR / ".git" / REPO_REFRESH_STAMP
+    if (REPO_CACHE_DIR / ".git").exists():
+        try:
+            if time.time() - stamp_file.stat().st_mtime < REPO_REFRESH_INTERVAL_SECONDS:
+                return
+        except OSError:
+            pass  # Never refreshed by this version
+
+        try:
+            remote_head = _git(REPO_CACHE_DIR, "-c", "protocol.version=2", "ls-remote", "origin", f"refs/heads/{REPO_BRANCH}").split("\t", 1)[0]
+            if remote_head != _git(REPO_CACHE_DIR, "rev-parse", "HEAD"):
+                # The partial clone filter is remembered by the remote config and applies here too
+                _git(REPO_CACHE_DIR, "-c", "protocol.version=2", "fetch", "--depth=1", "origin", REPO_BRANCH)
+                # The cache has no checkout; files are read from the object database
+                _git(REPO_CACHE_DIR, "reset", "--soft", "FETCH_HEAD")
+            stamp_file.touch()
+            return
+        except RuntimeError as e:
+            if _repo_cache_is_valid():
+                # E.g. the remote is unreachable; fixes keep working against the commit we have
+                logger.warning(f"[AUTOFIX] Refreshing repository cache failed, using its current HEAD: {e}")
+                return
+            # Idle worktrees of this process would break with the cache anyway
+            while _idle_worktrees:
+                worktree_dir = _idle_worktrees.pop()
+                try:
+                    _drop_worktree(worktree_dir)
+                except RuntimeError:
+                    cleanup_repo(worktree_dir)
+            if _registered_worktrees():
+                # Fixes of other threads or processes still run in worktrees linked into the cache
+                raise
+            logger.warning(f"[AUTOFIX] Repository cache is corrupt, re-cloning: {e}")
+            cleanup_repo(REPO_CACHE_DIR)
+
+    clone_repo(REPO_CACHE_DIR)
+    stamp_file.touch()
+
+
+def _repo_cache_is_valid() -> bool:
+    """Check whether the repository cache has a readable HEAD commit."""
+    try:
+        _git(REPO_CACHE_DIR, "rev-parse", "--verify", "HEAD^{commit}")
+        return True
+    except RuntimeError:
+        return False
+
+
+def _registered_worktrees() -> List[str]:
+    """
+    List the worktrees linked into the repository cache, besides the cache itself.
+
+    Falls back to the worktree bookkeeping under .git/ when git can't read
+    the cache. Must be called with the repository cache lock held.
+    """
+    try:
+        _git(REPO_CACHE_DIR, "worktree", "prune")
+        output = _git(REPO_CACHE_DIR, "worktree", "list", "--porcelain")
+        worktrees = [line.split(" ", 1)[1] for line in output.splitlines() if line.startswith("worktree ")]
+        return worktrees[1:]
+    except RuntimeError:
+        worktrees_dir = REPO_CACHE_DIR / ".git" / "worktrees"
+        return [entry.name for entry in worktrees_dir.iterdir()] if worktrees_dir.is_dir() else []
+
+
+def create_worktree(commit: str = None) -> Path:
+    """
+    Create a private worktree for a single fix.
+
+    An idle worktree of an earlier fix is reused when available: it is
+    switched to the commit and stripped of everything the earlier fix left.
+
+    Args:
+        commit: Commit to check out; defaults to the latest remote branch
+
+    Returns:
+        Path to the new worktree
+    """
+    with _repo_cache_lock():
+        if commit is None:
+            _refresh_repo_cache()
+        # Resolved in the cache, "HEAD" inside a reused worktree would be its own
+        commit = _git(REPO_CACHE_DIR, "rev-parse", "--verify", f"{commit or 'HEAD'}^{{commit}}")
+
+        while _idle_worktrees:
+            worktree_dir = _idle_worktrees.pop()
+            try:
+                _git(worktree_dir, "checkout", "--quiet", "--force", "--detach", commit)
+                _git(worktree_dir, "clean", "-fdxq")
+                return worktree_dir
+            except RuntimeError as e:
+                # E.g. the cache was re-cloned under it
+                logger.warning(f"[AUTOFIX] Discarding idle worktree {worktree_dir}: {e}")
+                _drop_worktree(worktree_dir)
+
+        parent_dir = SCRATCH_DIR
+        if SCRATCH_DIR != DISK_SCRATCH_DIR and not _has_room(SCRATCH_DIR):
+            logger.warning(f"[AUTOFIX] {SCRATCH_DIR} is almost full, creating the worktree in {DISK_SCRATCH_DIR}")
+            parent_dir = DISK_SCRATCH_DIR
+        parent_dir.mkdir(parents=True, exist_ok=True)
+        worktree_dir = Path(tempfile.mkdtemp(prefix="hackatum-k8s-flux_", dir=parent_dir))
+        try:
+            _git(REPO_CACHE_DIR, "worktree", "add", "--detach", str(worktree_dir), commit)
+        except Exception:
+            cleanup_repo(worktree_dir)
+            raise
+    return worktree_dir
+
+
+def remove_worktree(worktree_dir: Path) -> None:
+    """
+    Release a worktree created by create_worktree and delete its local branch.
+
+    The worktree is kept for reuse while the cache has no more than
+    WORKTREE_POOL_SIZE worktrees across all processes. Others are renamed
+    out of the way and unregistered right away; their files are deleted in
+    the background, so the caller doesn't wait for it.
+
+    Args:
+        worktree_dir: Path to the worktree to remove
+    """
+    with _repo_cache_lock():
+        try:
+            branch = _git(worktree_dir, "symbolic-ref", "--short", "HEAD")
+        except RuntimeError:
+            branch = None  # Still detached, nothing was committed
+
+        if _worktree_count() <= WORKTREE_POOL_SIZE:
+            try:
+                # Detached, the branch can go; the files are reset when the worktree is reused
+                _git(worktree_dir, "checkout", "--quiet", "--detach")
+                if branch:
+                    _git(REPO_CACHE_DIR, "branch", "-D", branch)
+                    branch = None
+                _idle_worktrees.append(worktree_dir)
+                return
+            except RuntimeError as e:
+                logger.warning(f"[AUTOFIX] Not reusing worktree {worktree_dir}: {e}")
+
+        _drop_worktree(worktree_dir)
+        if branch:
+            _git(REPO_CACHE_DIR, "branch", "-D", branch)
+
+
+def _worktree_count() -> int:
+    """
+    Count the worktrees registered in the repository cache by any process.
+
+    Reads git's administrative directories instead of running git worktree
+    list. Must be called with the repository cache lock held.
+    """
+    try:
+        return len(os.listdir(REPO_CACHE_DIR / ".git" / "worktrees"))
+    except OSError:
+        return 0
+
+
+def _drop_worktree(worktree_dir: Path) -> None:
+    """
+    Unregister a worktree and delete its files in the background.
+
+    The directory is renamed out of the way first, so git forgets the
+    worktree immediately. Must be called with the repository cache lock held.
+    """
+    trash_dir = worktree_dir.with_name(f".trash-{worktree_dir.name}")
+    try:
+        worktree_dir.rename(trash_dir)
+    except OSError:
+        try:
+            _git(REPO_CACHE_DIR, "worktree", "remove", "--force", str(worktree_dir))
+        except RuntimeError:
+            cleanup_repo(worktree_dir)
+            _git(REPO_CACHE_DIR, "worktree", "prune")
+        return
+
+    # Drops the bookkeeping of the worktree whose directory just disappeared
+    _git(REPO_CACHE_DIR, "worktree", "prune")
+    cleanup_repo(trash_dir, background=True)
+
+
+def cleanup_repo(repo_dir: Path, background: bool = False) -> None:
     """
     Clean up the cloned repository directory.
-    
+
+    Uses the native rm binary when available, which is much faster than
+    shutil.rmtree on the many small objects under .git/.
+
     Args:
         repo_dir: Path to the repository directory to remove
+        background: Start the removal without waiting for it to finish
     """
-    if repo_dir.exists():
-        shutil.rmtree(repo_dir)
+    if not repo_dir.exists():
+        return
+
+    if RM_BINARY is None:
+        if background:
+            threading.Thread(target=shutil.rmtree, args=(repo_dir,), kwargs={"ignore_errors": True}, daemon=True).start()
+        else:
+            shutil.rmtree(repo_dir, ignore_errors=True)
+    elif background:
+        subprocess.Popen(
+            [RM_BINARY, "-rf", str(repo_dir)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+    else:
+        subprocess.run([RM_BINARY, "-rf", str(repo_dir)], check=False)
+
+
+# Directories that never contain relevant content
+SKIP_DIRS = frozenset({'.git', '__pycache__', 'node_modules', '.venv', 'venv', '.pytest_cache'})
+
+# Only infrastructure files are useful context for Kubernetes fixes; READMEs,
+# licenses and lockfiles just inflate the prompt
+RELEVANT_SUFFIXES = ('.yaml', '.yml', '.json', '.toml', '.tf', '.hcl', '.sh', '.tpl', '.dockerfile')
+RELEVANT_NAMES = frozenset({'Dockerfile', 'Containerfile'})
+IRRELEVANT_NAMES = frozenset({'package-lock.json', 'composer.lock', 'Pipfile.lock'})
+
+# Bytes inspected for NUL to recognize binary files without decoding them
+BINARY_SNIFF_BYTES = 512
 
+# Files below these directories are listed first in the context
+PRIORITY_DIRS = frozenset({'manifests', 'kustomize', 'helm', 'charts', 'clusters', 'apps'})
 
-def collect_small_files(repo_dir: Path, max_size_kb: int = 5) -> List[Tuple[str, str]]:
+
+def _is_relevant_file(name: str) -> bool:
+    """Check whether a file name looks like infrastructure configuration."""
+    if name in IRRELEVANT_NAMES:
+        return False
+    return name.endswith(RELEVANT_SUFFIXES) or name in RELEVANT_NAMES
+
+
+def _is_priority_path(relative_path: str) -> bool:
+    """Check whether a file lives below one of the PRIORITY_DIRS."""
+    return any(part in PRIORITY_DIRS for part in relative_path.split('/')[:-1])
+
+
+def _git_bytes(repo_dir: Path, *args: str, input: bytes = None) -> bytes:
     """
-    Recursively collect all files smaller than max_size_kb from the repository.
+    Run a git command inside a repository and return its raw output.
+
+    Args:
+        repo_dir: Path to the repository to run the command in
+        *args: Arguments passed to git
+        input: Optional bytes fed to the command's stdin
+
+    Returns:
+        The command's stdout
+
+    Raises:
+        RuntimeError: If the git command fails
+    """
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=repo_dir,
+            input=input,
+            check=True,
+            capture_output=True,
+            env=GIT_ENV
+        )
+    except subprocess.CalledProcessError as e:
+        error_msg = f"Git command failed:\nCommand: {' '.join(e.cmd)}\nReturn code: {e.returncode}\nStderr: {e.stderr.decode('utf-8', 'replace')}"
+        raise RuntimeError(error_msg) from e
+    return result.stdout
+
+
+def collect_small_files(repo_dir: Path, max_size_kb: int = 5, commit: str = "HEAD") -> List[Tuple[str, str]]:
+    """
+    Collect all relevant files smaller than max_size_kb from a commit of the repository.
+
+    Files are read straight from the object database, so no checkout is
+    needed: git ls-tree lists the tree, file names are checked against the
+    relevance allowlist, and two git cat-file --batch processes return the
+    sizes and then the contents of the remaining blobs. Blobs left out of a
+    partial clone are skipped instead of being fetched. The result follows
+    the tree's path order, with files below PRIORITY_DIRS first.
     
     Args:
         repo_dir: Path to the repository directory
         max_size_kb: Maximum file size in KB (default: 5)
+        commit: Commit to read the files from
         
     Returns:
         List of tuples containing (relative_path, file_content)
     """
-    collected_files = []
     max_size_bytes = max_size_kb * 1024
-    
-    # Skip common directories that should be ignored
-    skip_dirs = {'.git', '__pycache__', 'node_modules', '.venv', 'venv', '.pytest_cache'}
-    
-    for root, dirs, files in os.walk(repo_dir):
-        # Remove skip_dirs from dirs in-place to prevent os.walk from entering them
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        
-        for file in files:
-            file_path = Path(root) / file
-            try:
-                # Check file size
-                if file_path.stat().st_size <= max_size_bytes:
-                    # Try to read as text
-                    try:
-                        content = file_path.read_text(encoding='utf-8')
-                        relative_path = file_path.relative_to(repo_dir)
-                        collected_files.append((str(relative_path), content))
-                    except (UnicodeDecodeError, PermissionError):
-                        # Skip binary files or files we can't read
-                        pass
-            except (OSError, PermissionError):
-                # Skip files we can't access
-                pass
-    
+
+    candidates = []
+    for record in _git_bytes(repo_dir, "ls-tree", "-r", "-z", "--full-tree", commit).split(b"\0"):
+        if not record:
+            continue
+        meta, raw_path = record.split(b"\t", 1)
+        mode, object_type, object_name = meta.split(b" ")
+        # Skip symlinks and submodules
+        if object_type != b"blob" or mode == b"120000":
+            continue
+        rel_path = raw_path.decode("utf-8", "replace")
+        parts = rel_path.split("/")
+        if any(part in SKIP_DIRS for part in parts) or not _is_relevant_file(parts[-1]):
+            continue
+        candidates.append((rel_path, object_name))
+    if not candidates:
+        return []
+
+    # Blobs a partial clone filtered out are marked with '?'; looking them up would fetch them
+    missing = {
+        line[1:]
+        for line in _git_bytes(repo_dir, "rev-list", "--objects", "--missing=print", commit).split(b"\n")
+        if line.startswith(b"?")
+    }
+    candidates = [(rel_path, object_name) for rel_path, object_name in candidates if object_name not in missing]
+
+    sizes = _git_bytes(
+        repo_dir, "cat-file", "--batch-check=%(objectsize)",
+        input=b"\n".join(object_name for _, object_name in candidates) + b"\n"
+    ).split()
+    small = [candidate for candidate, size in zip(candidates, sizes) if int(size) <= max_size_bytes]
+    if not small:
+        return []
+
+    output = _git_bytes(
+        repo_dir, "cat-file", "--batch",
+        input=b"\n".join(object_name for _, object_name in small) + b"\n"
+    )
+    collected_files = []
+    pos = 0
+    for rel_path, _ in small:
+        # Each object is "<name> <type> <size>\n<content>\n"
+        header_end = output.index(b"\n", pos)
+        size = int(output[pos:header_end].rsplit(b" ", 1)[1])
+        data = output[header_end + 1:header_end + 1 + size]
+        pos = header_end + 1 + size + 1
+
+        # Binary files almost always contain a NUL byte early on
+        if b"\x00" in data[:BINARY_SNIFF_BYTES]:
+            continue
+        try:
+            collected_files.append((rel_path, data.decode("utf-8")))
+        except UnicodeDecodeError:
+            # Skip other non-UTF-8 files
+            continue
+
+    collected_files.sort(key=lambda item: not _is_priority_path(item[0]))
     return collected_files
 
 
-def build_context_string(files: List[Tuple[str, str]]) -> str:
+def build_context_string(files: Iterable[Tuple[str, str]], max_chars: int = None) -> str:
     """
     Build a context string from collected files with file paths and line numbers.
+
+    Writes into a single buffer instead of accumulating per-file fragments,
+    so files can also be streamed in from an iterator.
     
     Args:
-        files: List of tuples containing (relative_path, file_content)
+        files: Iterable of tuples containing (relative_path, file_content)
+        max_chars: Stop adding files once the next one would exceed this many characters
         
     Returns:
         Formatted context string with line numbers
     """
-    context_parts = []
+    buf = io.StringIO()
     for file_path, content in files:
-        context_parts.append(f"=== FILE: {file_path} ===")
-        # Add line numbers to the content
-        lines = content.split('\n')
-        numbered_lines = [f"{i+1:4d} | {line}" for i, line in enumerate(lines)]
-        context_parts.append('\n'.join(numbered_lines))
-        context_parts.append("")  # Empty line between files
+        # Unpadded numbers without spaces around the separator save tokens on every line;
+        # the file's final newline doesn't start another (empty) line
+        if content.endswith('\n'):
+            content = content[:-1]
+        # Number all lines in one join; the trailing newline leaves an empty line between files
+        numbered = "".join(f"{i}|{line}\n" for i, line in enumerate(content.split('\n'), start=1))
+        block_str = f"=== FILE: {file_path} ===\n{numbered}\n"
+        if max_chars is not None and buf.tell() + len(block_str) > max_chars:
+            break
+        buf.write(block_str)
     
-    return "\n".join(context_parts)
+    return buf.getvalue()
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((Exception,)),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True,
-)
-def call_gemini_for_patch(context: str, vulnerability: Dict[str, Any], node_info: Dict[str, Any]) -> str:
+def _relevance_terms(vulnerability: Dict[str, Any], node_info: Dict[str, Any]) -> List[str]:
+    """
+    Collect the names that identify the affected resource in manifests.
+
+    Pod names carry generated ReplicaSet/pod suffixes that never appear in
+    the repository, so the workload name is derived by dropping them.
+    """
+    terms = []
+    if node_info:
+        label = node_info.get("label") or ""
+        if node_info.get("type") == "pod" and label.count("-") >= 2:
+            label = label.rsplit("-", 2)[0]
+        terms.append(label)
+        namespace = node_info.get("namespace") or ""
+        if namespace != "default":
+            terms.append(namespace)
+    terms.append(vulnerability.get("container") or "")
+    # Scanner findings on configmaps/secrets name the object as "<namespace>/<kind>/<name>"
+    terms.append((vulnerability.get("resource") or "").rsplit("/", 1)[-1])
+    return [term for term in terms if len(term) > 2]
+
+
+def _relevance_score(item: Tuple[str, str], terms: List[str]) -> int:
+    """Score a file by how often and where it names the affected resource."""
+    file_path, content = item
+    value = 0
+    for term in terms:
+        if term in file_path:
+            value += 4
+        if term in content:
+            value += 2
+    if file_path.endswith(('.yaml', '.yml')) and 'kind:' in content:
+        value += 1
+    return value
+
+
+def rank_files_for_vulnerabilities(
+    files: List[Tuple[str, str]], vulnerabilities: List[Dict[str, Any]], node_info: Dict[str, Any]
+) -> List[Tuple[str, str]]:
+    """
+    Order files by how likely they are to contain the vulnerable resources.
+
+    Files naming an affected workload in their path score highest, then
+    files mentioning it in their content, then plain Kubernetes manifests.
+    Each file ranks by its best score for any of the vulnerabilities, so the
+    files of every finding in a shared context make it in, not just the
+    first one's. The sort is stable, so ties keep the collection order.
+
+    Args:
+        files: List of tuples containing (relative_path, file_content)
+        vulnerabilities: The vulnerabilities sharing the context
+        node_info: Information about the node where the vulnerabilities were found
+
+    Returns:
+        The files, most relevant first
+    """
+    term_sets = [_relevance_terms(vulnerability, node_info) for vulnerability in vulnerabilities]
+    return [item for _, item in _rank_scored(files, term_sets)]
+
+
+def _rank_scored(files: List[Tuple[str, str]], term_sets: List[List[str]]) -> List[Tuple[int, Tuple[str, str]]]:
+    """Score each file once, by its best score for any term set, and sort; ties keep the collection order."""
+    scored = [(max(_relevance_score(item, terms) for terms in term_sets), item) for item in files]
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+    return scored
+
+
+def select_context_files(
+    files: List[Tuple[str, str]],
+    vulnerability: Dict[str, Any],
+    node_info: Dict[str, Any],
+    top_k: int = CONTEXT_TOP_FILES,
+) -> List[Tuple[str, str]]:
+    """
+    Pick the files worth sending to Gemini for a vulnerability.
+
+    Keeps the top_k files that name the affected resource, followed by the
+    other files in their directories (kustomizations, sibling manifests).
+    If no file names the resource, all files are returned by rank and the
+    context cap decides.
+
+    Args:
+        files: List of tuples containing (relative_path, file_content)
+        vulnerability: The vulnerability data
+        node_info: Information about the node where the vulnerability was found
+        top_k: Maximum number of matching files
+
+    Returns:
+        The selected files, most relevant first
+    """
+    scored = _rank_scored(files, [_relevance_terms(vulnerability, node_info)])
+    ranked = [item for _, item in scored]
+    # A score of 1 only means "is a manifest"
+    top = [item for score, item in scored if score > 1][:top_k]
+    if not top:
+        return ranked
+
+    selected_paths = {file_path for file_path, _ in top}
+    directories = {os.path.dirname(file_path) for file_path in selected_paths}
+    siblings = [
+        item for item in ranked
+        if item[0] not in selected_paths and os.path.dirname(item[0]) in directories
+    ]
+    return top + siblings
+
+
+def _patch_cache_key(context: str, vulnerability: Dict[str, Any], node_info: Dict[str, Any]) -> str:
+    """
+    Build the patch cache key from the model, the prompt inputs and the repository context.
+
+    The vulnerability and node are hashed as canonical JSON, so a finding
+    whose details changed under the same ID gets a new patch. The context
+    is derived from the commit, so a new commit invalidates the entry too.
+    """
+    key_material = "\0".join((
+        GEMINI_MODEL,
+        json.dumps(vulnerability, sort_keys=True, default=str),
+        json.dumps(node_info, sort_keys=True, default=str),
+        hashlib.sha256(context.encode("utf-8")).hexdigest(),
+    ))
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+def _load_cached_patches(cache_key: str) -> Optional[List[str]]:
+    """
+    Look up previously generated patches.
+
+    Args:
+        cache_key: Key returned by _patch_cache_key
+
+    Returns:
+        The cached patches, or None if there is no fresh entry
+    """
+    cache_file = PATCH_CACHE_DIR / f"{cache_key}.json"
+    try:
+        if time.time() - cache_file.stat().st_mtime > PATCH_CACHE_TTL_SECONDS:
+            return None
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)["patches"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _store_cached_patches(cache_key: str, patches: List[str]) -> None:
+    """
+    Store generated patches so identical requests can skip the Gemini call.
+
+    The entry is written to a temporary file and renamed into place so
+    concurrent readers never see a partial entry.
+
+    Args:
+        cache_key: Key returned by _patch_cache_key
+        patches: The validated patches
+    """
+    try:
+        PATCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=PATCH_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"model": GEMINI_MODEL, "patches": patches}, f)
+        os.replace(tmp_path, PATCH_CACHE_DIR / f"{cache_key}.json")
+    except OSError as e:
+        logger.warning(f"[AUTOFIX] Could not write patch cache entry: {e}")
+
+
+def get_repo_files() -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Refresh the repository cache and collect the small files of its latest commit.
+
+    Files are read straight from the repository cache's object database, so
+    no checkout is needed to generate a patch. The collected files are
+    memoized by commit, so all fixes in a scan cycle share a single
+    collection.
+
+    Returns:
+        Tuple of (commit SHA, collected files)
+    """
+    with _repo_cache_lock():
+        _refresh_repo_cache()
+        head = _git(REPO_CACHE_DIR, "rev-parse", "HEAD")
+
+    with _repo_files_cache_lock:
+        files = _repo_files_cache.get(head)
+    if files is None:
+        # Objects of a commit never change, so later refreshes can't interfere
+        files = collect_small_files(REPO_CACHE_DIR, max_size_kb=5, commit=head)
+        with _repo_files_cache_lock:
+            _repo_files_cache[head] = files
+            while len(_repo_files_cache) > REPO_FILES_CACHE_SIZE:
+                # Dicts keep insertion order, so the first key is the oldest commit
+                del _repo_files_cache[next(iter(_repo_files_cache))]
+    return head, files
+
+
+def prewarm() -> None:
+    """
+    Do the one-time setup of the first fix ahead of time.
+
+    Clones the repository cache, collects its files, puts a worktree into
+    the pool and loads the Gemini SDK. Failures are only logged; the first
+    fix then retries the same steps.
+    """
+    try:
+        commit, files = get_repo_files()
+        remove_worktree(create_worktree(commit))
+        logger.info(f"[AUTOFIX] Prewarmed repository cache at {commit[:12]} with {len(files)} files")
+    except Exception as e:
+        logger.warning(f"[AUTOFIX] Prewarming the repository cache failed: {e}")
+
+    try:
+        get_gemini_model(response_schema=PATCH_SCHEMA, candidate_count=PATCH_CANDIDATE_COUNT)
+    except Exception as e:
+        logger.warning(f"[AUTOFIX] Prewarming the Gemini model failed: {e}")
+
+
+def format_fix_inputs(vulnerability: Dict[str, Any], node_info: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Serialize the vulnerability and node information for prompts and the PR body.
+
+    Args:
+        vulnerability: The vulnerability data
+        node_info: Information about the node where the vulnerability was found
+
+    Returns:
+        Tuple of (vulnerability JSON, node JSON or "N/A")
+    """
+    vulnerability_json = orjson.dumps(vulnerability, option=orjson.OPT_INDENT_2).decode()
+    return vulnerability_json, format_node_info(node_info)
+
+
+def format_node_info(node_info: Dict[str, Any]) -> str:
+    """
+    Serialize the node information for prompts and the PR body.
+
+    Args:
+        node_info: Information about the node where the vulnerability was found
+
+    Returns:
+        The node JSON, or "N/A" without node information
+    """
+    return orjson.dumps(node_info, option=orjson.OPT_INDENT_2).decode() if node_info else "N/A"
+
+
+@_gemini_retry
+def call_gemini_for_patch(
+    context: str,
+    vulnerability: Dict[str, Any],
+    node_info: Dict[str, Any],
+    vulnerability_json: str = None,
+    node_json: str = None,
+    no_cache: bool = False,
+) -> List[str]:
     """
     Call Gemini 2.0 Flash API to generate a patch file for the vulnerability.
-    Retries up to 3 times with exponential backoff.
+    Transient API errors are retried up to 3 times with jittered exponential backoff.
     Uses structured output to ensure valid patch format.
+    Requests PATCH_CANDIDATE_COUNT candidates in one call so a candidate that
+    doesn't apply can be replaced without another round-trip.
+    Patches are cached on disk for PATCH_CACHE_TTL_SECONDS, keyed by the
+    model, the vulnerability, the node and a hash of the context.
     
     Args:
         context: The concatenated file context
         vulnerability: The vulnerability data
         node_info: Information about the node where the vulnerability was found
+        vulnerability_json: Pre-serialized vulnerability from format_fix_inputs
+        node_json: Pre-serialized node information from format_fix_inputs
+        no_cache: Ignore cached patches and ask Gemini again (the new result is still cached)
         
     Returns:
-        Generated patch file content
+        Distinct valid patches, in candidate order
         
     Raises:
-        ValueError: If API key is not set or patch is invalid
-        Exception: If patch generation fails after retries
+        ValueError: If API key is not set or no candidate is a valid patch
+        TransientGeminiError: If Gemini is still unavailable after retries
     """
+    cache_key = _patch_cache_key(context, vulnerability, node_info)
+    cached_patches = None if no_cache else _load_cached_patches(cache_key)
+    if cached_patches is not None:
+        logger.info(f"[AUTOFIX] Using cached patch for vulnerability: {vulnerability.get('id', 'unknown')}")
+        return cached_patches
+
     logger.info(f"[AUTOFIX] Calling Gemini API for vulnerability: {vulnerability.get('id', 'unknown')}")
     
-    # Use structured output schema to force valid patch format
-    patch_schema = {
-        "type": "object",
-        "properties": {
-            "patch": {
-                "type": "string",
-                "description": "A valid unified diff patch that can be applied with 'patch -p1'. Must start with '---' and contain '+++' and '@@' markers."
-            },
-            "file_path": {
-                "type": "string",
-                "description": "The relative path to the file being patched"
-            },
-            "summary": {
-                "type": "string",
-                "description": "Brief one-line summary of the fix"
-            }
-        },
-        "required": ["patch", "file_path", "summary"]
-    }
-    
-    model = get_gemini_model(response_schema=patch_schema)
+    model = get_gemini_model(response_schema=PATCH_SCHEMA, candidate_count=PATCH_CANDIDATE_COUNT)
     
     # Build the prompt
-    vulnerability_info = json.dumps(vulnerability, indent=2)
-    node_info_str = json.dumps(node_info, indent=2) if node_info else "N/A"
+    if vulnerability_json is None or node_json is None:
+        vulnerability_json, node_json = format_fix_inputs(vulnerability, node_info)
     
-    prompt = f"""You are a security expert fixing Kubernetes vulnerabilities.
-
+    # The static instructions come first so the shared prefix can be served from Gemini's prompt cache
+    prompt = f"""{PATCH_PROMPT_PREAMBLE}
 VULNERABILITY:
-{vulnerability_info}
+{vulnerability_json}
 
 NODE:
-{node_info_str}
+{node_json}
 
 REPOSITORY FILES (with line numbers):
-Note: Files are shown with line numbers in the format "LINE_NUMBER | content".
-Use these line numbers to understand the file structure and generate accurate patches.
-
 {context}
 
-TASK: Generate a unified diff patch to fix this vulnerability.
+Generate the patch:"""
 
-RULES:
-1. Output ONLY valid unified diff format (use --- and +++ headers, @@ hunks)
-2. Make MINIMAL changes - only what's needed to fix the vulnerability
-3. NO comments, NO explanations - pure patch content only
-4. For RBAC wildcards: replace "*" with specific resource names (e.g., "customresourcedefinitions.apiextensions.k8s.io")
-5. For resource limits: add CPU/memory limits to containers
-6. For security: add runAsNonRoot, capabilities, securityContext
-7. Ensure YAML indentation is EXACT and correct
-8. The line numbers shown are for reference - your patch should use standard unified diff format without line numbers
+    response = _generate_content(model, prompt)
 
-EXAMPLES:
-RBAC fix: Change "resources: ['*']" to "resources: ['customresourcedefinitions']"
-Limits fix: Add "resources: {{limits: {{cpu: '100m', memory: '128Mi'}}}}"
+    # Keep every candidate that is a valid patch; an invalid one only matters if none is valid
+    patches = []
+    first_error = None
+    for candidate in response.candidates:
+        candidate_text = "".join(part.text for part in candidate.content.parts)
+        try:
+            patch_content = _parse_patch_response(candidate_text)
+        except ValueError as e:
+            first_error = first_error or e
+            continue
+        if patch_content not in patches:
+            patches.append(patch_content)
 
-Generate the patch:"""
+    if not patches:
+        raise first_error or ValueError("Gemini returned no candidates")
 
-    # Call Gemini API
-    response = model.generate_content(prompt)
-    
-    # Parse JSON response
+    logger.info(f"[AUTOFIX] Patch validation passed for {len(patches)} candidate(s)")
+    _store_cached_patches(cache_key, patches)
+    return patches
+
+
+def _parse_patch_response(response_text: str) -> str:
+    """
+    Extract and validate the patch from a structured Gemini response.
+
+    Args:
+        response_text: JSON text of a single response candidate
+
+    Returns:
+        The patch, ending with a newline
+
+    Raises:
+        ValueError: If the response is not valid JSON or the patch is not a unified diff
+    """
     try:
-        result = json.loads(response.text)
+        result = json.loads(response_text)
         patch_content = result.get("patch", "")
         file_path = result.get("file_path", "unknown")
         summary = result.get("summary", "")
@@ -259,100 +1172,157 @@ Generate the patch:"""
         logger.info(f"[AUTOFIX] Patch size: {len(patch_content)} chars")
     except json.JSONDecodeError as e:
         logger.error(f"[AUTOFIX] Failed to parse structured output: {e}")
-        logger.error(f"[AUTOFIX] Raw response: {response.text[:500]}")
+        logger.error(f"[AUTOFIX] Raw response: {response_text[:500]}")
         raise ValueError(f"Gemini returned invalid JSON: {e}")
-    
+
+    return _validate_patch(patch_content)
+
+
+# Start of a unified diff: the ---/+++ file headers followed by the first hunk
+_PATCH_HEADER_RE = re.compile(r"---[^\n]*\n\+\+\+[^\n]*\n@@")
+
+
+def _validate_patch(patch_content: str) -> str:
+    """
+    Check that a generated patch is a unified diff.
+
+    Args:
+        patch_content: The patch text returned by Gemini
+
+    Returns:
+        The stripped patch, ending with a newline
+
+    Raises:
+        ValueError: If the patch is empty or not a unified diff
+    """
     if not patch_content:
         raise ValueError("Gemini returned empty patch")
     
     # Validate and clean patch
     patch_content = patch_content.strip()
     
-    logger.info(f"[AUTOFIX] Received patch from Gemini ({len(patch_content)} chars)")
-    
-    # Validate patch has required components (these checks will now rarely fail due to structured output)
-    if not patch_content.startswith("---"):
+    # Validate patch has required components (this will now rarely fail due to structured output)
+    if not _PATCH_HEADER_RE.match(patch_content):
         logger.error(f"[AUTOFIX] Invalid patch start: {patch_content[:100]}")
-        raise ValueError("Generated patch doesn't start with --- (not a valid unified diff)")
-    
-    if "+++" not in patch_content:
-        raise ValueError("Generated patch missing +++ header (not a valid unified diff)")
-    
-    if "@@" not in patch_content:
-        raise ValueError("Generated patch missing @@ hunk markers (not a valid unified diff)")
+        raise ValueError("Generated patch doesn't start with ---, +++ and @@ lines (not a valid unified diff)")
     
     # Ensure patch ends with newline
     if not patch_content.endswith("\n"):
         patch_content += "\n"
     
-    logger.info("[AUTOFIX] Patch validation passed")
     return patch_content
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((Exception,)),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True,
-)
-def generate_pr_description(patch_content: str, vulnerability: Dict[str, Any], node_info: Dict[str, Any]) -> str:
+@_gemini_retry
+def call_gemini_for_batch_patch(
+    context: str,
+    vulnerabilities: List[Dict[str, Any]],
+    node_info: Dict[str, Any],
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Call Gemini once to generate a separate patch for each of several vulnerabilities.
+    Transient API errors are retried up to 3 times with jittered exponential backoff.
+
+    All vulnerabilities share the repository context, so it is only sent
+    (and billed) once instead of once per vulnerability.
+
+    Args:
+        context: The concatenated file context
+        vulnerabilities: The vulnerabilities to fix
+        node_info: Information about the node where the vulnerabilities were found
+
+    Returns:
+        Mapping of vulnerability ID to (patch, summary) for every valid patch returned
+
+    Raises:
+        ValueError: If API key is not set or the response is not valid JSON
+        TransientGeminiError: If Gemini is still unavailable after retries
+    """
+    logger.info(f"[AUTOFIX] Calling Gemini API for {len(vulnerabilities)} vulnerabilities")
+
+    model = get_gemini_model(response_schema=BATCH_PATCH_SCHEMA)
+
+    vulnerabilities_json = "\n\n".join(format_fix_inputs(vulnerability, None)[0] for vulnerability in vulnerabilities)
+    node_json = format_node_info(node_info)
+
+    prompt = f"""{PATCH_PROMPT_PREAMBLE}
+Fix EACH of the following vulnerabilities with its own patch. Every patch must
+apply on top of the previous ones, so never change the same lines twice.
+
+VULNERABILITIES:
+{vulnerabilities_json}
+
+NODE:
+{node_json}
+
+REPOSITORY FILES (with line numbers):
+{context}
+
+Generate the patches:"""
+
+    response = _generate_content(model, prompt)
+
+    try:
+        fixes = json.loads(response.text).get("fixes", [])
+    except json.JSONDecodeError as e:
+        logger.error(f"[AUTOFIX] Failed to parse structured output: {e}")
+        logger.error(f"[AUTOFIX] Raw response: {response.text[:500]}")
+        raise ValueError(f"Gemini returned invalid JSON: {e}")
+
+    patches = {}
+    for fix in fixes:
+        vuln_id = fix.get("vulnerability_id", "")
+        try:
+            patches[vuln_id] = (_validate_patch(fix.get("patch", "")), fix.get("summary", ""))
+        except ValueError as e:
+            logger.warning(f"[AUTOFIX] Discarding patch for {vuln_id}: {e}")
+
+    logger.info(f"[AUTOFIX] Received {len(patches)} valid patches for {len(vulnerabilities)} vulnerabilities")
+    return patches
+
+
+@_gemini_retry
+def generate_pr_description(
+    patch_content: str,
+    vulnerability: Dict[str, Any],
+    node_info: Dict[str, Any],
+    vulnerability_json: str = None,
+    node_json: str = None,
+) -> str:
     """
     Generate a human-readable PR description explaining the vulnerability fix.
     Uses Gemini to create a clear explanation of the issue and the solution.
-    Retries up to 3 times with exponential backoff.
+    Transient API errors are retried up to 3 times with jittered exponential backoff.
     
     Args:
         patch_content: The patch that was generated to fix the vulnerability
         vulnerability: The vulnerability data
         node_info: Information about the node where the vulnerability was found
+        vulnerability_json: Pre-serialized vulnerability from format_fix_inputs
+        node_json: Pre-serialized node information from format_fix_inputs
         
     Returns:
         Human-readable PR description
         
     Raises:
         ValueError: If API key is not set
-        Exception: If description generation fails after retries
+        TransientGeminiError: If Gemini is still unavailable after retries
     """
     logger.info(f"[AUTOFIX] Generating PR description for vulnerability: {vulnerability.get('id', 'unknown')}")
     
-    # Use structured output schema
-    description_schema = {
-        "type": "object",
-        "properties": {
-            "title": {
-                "type": "string",
-                "description": "A concise title summarizing the security fix"
-            },
-            "problem_explanation": {
-                "type": "string",
-                "description": "A clear explanation of why this was a security issue, written for humans. Should explain the risk and impact."
-            },
-            "fix_explanation": {
-                "type": "string",
-                "description": "A clear explanation of how the fix addresses the problem, written for humans. Should explain what changes were made and why they solve the issue."
-            },
-            "technical_details": {
-                "type": "string",
-                "description": "Technical details about the specific changes made in the patch"
-            }
-        },
-        "required": ["title", "problem_explanation", "fix_explanation", "technical_details"]
-    }
-    
-    model = get_gemini_model(response_schema=description_schema)
+    model = get_gemini_model(response_schema=DESCRIPTION_SCHEMA)
     
     # Build the prompt
-    vulnerability_info = json.dumps(vulnerability, indent=2)
-    node_info_str = json.dumps(node_info, indent=2) if node_info else "N/A"
+    if vulnerability_json is None or node_json is None:
+        vulnerability_json, node_json = format_fix_inputs(vulnerability, node_info)
     
     prompt = f"""You are a security expert writing a clear pull request description for a security fix.
 
 VULNERABILITY INFORMATION:
-{vulnerability_info}
+{vulnerability_json}
 
 NODE INFORMATION:
-{node_info_str}
+{node_json}
 
 GENERATED PATCH:
 {patch_content}
@@ -369,8 +1339,7 @@ GUIDELINES:
 
 Generate a comprehensive PR description that helps reviewers understand both the problem and the solution."""
     
-    # Call Gemini API
-    response = model.generate_content(prompt)
+    response = _generate_content(model, prompt)
     
     # Parse JSON response
     try:
@@ -415,76 +1384,151 @@ Generate a comprehensive PR description that helps reviewers understand both the
         raise ValueError(f"Gemini returned invalid JSON for description: {e}")
 
 
+def _patch_applies(repo_dir: Path, patch_content: str) -> bool:
+    """Check whether git apply accepts a patch in the repository's current state."""
+    if apply_unified_diff(repo_dir, patch_content, dry_run=True):
+        return True
+    result = subprocess.run(
+        ["git", "apply", "--check", "--recount", "-"],
+        cwd=repo_dir,
+        input=patch_content,
+        capture_output=True,
+        text=True,
+        env=GIT_ENV
+    )
+    return result.returncode == 0
+
+
+def select_patch(repo_dir: Path, patches: List[str]) -> str:
+    """
+    Pick the first patch that git apply accepts without changes.
+
+    Args:
+        repo_dir: Path to the repository directory
+        patches: Candidate patches, best first
+
+    Returns:
+        The first patch that applies cleanly, or the first patch if none
+        does (apply_patch then still tries a fuzzy apply)
+    """
+    for index, patch_content in enumerate(patches):
+        if _patch_applies(repo_dir, patch_content):
+            if index:
+                logger.info(f"[AUTOFIX] Using patch candidate {index + 1}, earlier candidates don't apply")
+            return patch_content
+    return patches[0]
+
+
 def apply_patch(repo_dir: Path, patch_content: str) -> None:
     """
-    Apply a patch file to the repository.
+    Apply a patch to the repository.
+
+    Patches whose context matches the files exactly are applied in-process.
+    Everything else is piped to git apply on stdin, so no temporary patch
+    file is written. Patches that git apply rejects are retried with patch,
+    which tolerates the slightly shifted hunks the model sometimes produces.
     
     Args:
         repo_dir: Path to the repository directory
         patch_content: The patch file content to apply
+
+    Raises:
+        RuntimeError: If neither git apply nor patch can apply the patch
     """
-    # Write patch to temporary file
-    patch_file = repo_dir / "autofix.patch"
-    patch_file.write_text(patch_content)
-    
+    if apply_unified_diff(repo_dir, patch_content):
+        logger.info("[AUTOFIX] Patch applied successfully in-process")
+        return
+
+    git_apply_cmd = ["git", "apply", "--recount", "--whitespace=fix", "-"]
+    try:
+        subprocess.run(
+            git_apply_cmd,
+            cwd=repo_dir,
+            input=patch_content,
+            check=True,
+            capture_output=True,
+            text=True,
+            env=GIT_ENV
+        )
+        logger.info("[AUTOFIX] Patch applied successfully with git apply")
+        return
+    except subprocess.CalledProcessError as e:
+        logger.info(f"[AUTOFIX] git apply rejected the patch, falling back to patch: {e.stderr.strip()}")
+
+    # Never leave .orig/.rej files behind that would end up in the commit
+    patch_cmd = ["patch", "-p1", "--forward", "--batch", "--no-backup-if-mismatch", "--reject-file=-"]
     try:
-        # Apply the patch
         result = subprocess.run(
-            ["patch", "-p1", "-i", str(patch_file)],
+            patch_cmd,
             cwd=repo_dir,
+            input=patch_content,
             check=True,
             capture_output=True,
             text=True
         )
-        print(f"Patch applied successfully: {result.stdout}")
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Failed to apply patch:\nCommand: patch -p1 -i {patch_file}\nReturn code: {e.returncode}\nStdout: {e.stdout}\nStderr: {e.stderr}\n\nPatch content:\n{patch_content}"
+        logger.info(f"[AUTOFIX] Patch applied successfully: {result.stdout}")
+    except (OSError, subprocess.CalledProcessError) as e:
+        details = f"Return code: {e.returncode}\nStdout: {e.stdout}\nStderr: {e.stderr}" if isinstance(e, subprocess.CalledProcessError) else str(e)
+        error_msg = f"Failed to apply patch:\nCommand: {' '.join(patch_cmd)}\n{details}\n\nPatch content:\n{patch_content}"
         raise RuntimeError(error_msg) from e
-    finally:
-        # Clean up patch file
-        if patch_file.exists():
-            patch_file.unlink()
 
 
-def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] = None) -> Dict[str, Any]:
+def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] = None, no_cache: bool = False) -> Dict[str, Any]:
     """
     Fix a vulnerability by using Gemini AI to generate and apply a patch.
     
     Args:
         vulnerability: The vulnerability data from the scan report
         node_info: Information about the node where the vulnerability was found
+        no_cache: Regenerate the patch even if an identical request was cached
         
     Returns:
         A dictionary with the fix result
     """
     repo_dir = None
+    vuln_id_token = _current_vuln_id.set(vulnerability.get('id', 'unknown'))
     try:
-        print(f"[AUTOFIX] Starting fix process for vulnerability: {vulnerability.get('id', 'unknown')}", flush=True)
-        
-        # Step 1: Clone the repository
-        print("[AUTOFIX] Step 1: Cloning repository...", flush=True)
-        repo_dir = clone_repo()
-        print(f"[AUTOFIX] Repository cloned to: {repo_dir}", flush=True)
-        
-        # Step 2: Collect all files < 5KB
-        print("[AUTOFIX] Step 2: Collecting files < 5KB...", flush=True)
-        files = collect_small_files(repo_dir, max_size_kb=5)
-        print(f"[AUTOFIX] Collected {len(files)} files", flush=True)
-        
-        # Step 3: Build context string
-        print("[AUTOFIX] Step 3: Building context string...", flush=True)
-        context = build_context_string(files)
-        print(f"[AUTOFIX] Context built: {len(context)} characters", flush=True)
-        
-        # Step 4: Call Gemini to generate patch
-        print("[AUTOFIX] Step 4: Calling Gemini API to generate patch...", flush=True)
-        patch_content = call_gemini_for_patch(context, vulnerability, node_info)
-        print(f"[AUTOFIX] Patch generated: {len(patch_content)} characters", flush=True)
+        logger.info(f"[AUTOFIX] Starting fix process for vulnerability: {vulnerability.get('id', 'unknown')}")
         
+        # Serialized once for both prompts and the PR body
+        vulnerability_json, node_json = format_fix_inputs(vulnerability, node_info)
+
+        # Step 1 + 2: Update the repository cache and collect all files < 5KB (reused per commit)
+        logger.info("[AUTOFIX] Step 1: Updating repository and collecting files < 5KB...")
+        commit, files = get_repo_files()
+        logger.info(f"[AUTOFIX] Collected {len(files)} files at {commit[:12]}")
+
+        # Check out the commit the patch is generated against while the patch is generated
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            worktree_future = executor.submit(copy_context().run, create_worktree, commit)
+            try:
+                # Step 3: Known vulnerability types are fixed by a rule, without Gemini
+                rule_patch = rules.try_fix(vulnerability, node_info, files)
+                if rule_patch:
+                    logger.info(f"[AUTOFIX] Patch generated by rule for {vulnerability.get('type')}")
+                    patches = [rule_patch]
+                else:
+                    # Step 4: Build the context string and call Gemini to generate patch
+                    logger.info("[AUTOFIX] Step 4: Calling Gemini API to generate patch...")
+                    context_files = select_context_files(files, vulnerability, node_info)
+                    context = build_context_string(context_files, max_chars=MAX_CONTEXT_CHARS)
+                    logger.info(f"[AUTOFIX] Context built from {len(context_files)} files: {len(context)} characters")
+                    patches = call_gemini_for_patch(
+                        context, vulnerability, node_info, vulnerability_json, node_json, no_cache=no_cache
+                    )
+                    logger.info(f"[AUTOFIX] Patch generated: {len(patches)} candidate(s)")
+            finally:
+                # Remembered even if patch generation failed, so the worktree is removed below
+                if worktree_future.exception() is None:
+                    repo_dir = worktree_future.result()
+        repo_dir = worktree_future.result()
+        logger.info(f"[AUTOFIX] Worktree created at: {repo_dir}")
+
         # Step 5: Apply the patch
-        print("[AUTOFIX] Step 5: Applying patch...", flush=True)
+        logger.info("[AUTOFIX] Step 5: Applying patch...")
+        patch_content = select_patch(repo_dir, patches)
         apply_patch(repo_dir, patch_content)
-        print("[AUTOFIX] Patch applied successfully", flush=True)
+        logger.info("[AUTOFIX] Patch applied successfully")
         
         # Step 6: Generate branch name and commit message
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -492,18 +1536,22 @@ def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] =
         branch_name = f"autofix/{vuln_id}-{timestamp}"
         commit_message = f"Auto-fix: Resolve {vuln_id}\n\nAutomatically generated fix for vulnerability {vuln_id}"
         
-        # Step 7: Commit and push changes
-        print(f"[AUTOFIX] Step 6: Committing and pushing to branch {branch_name}...", flush=True)
-        commit_and_push_changes(repo_dir, branch_name, commit_message)
-        print("[AUTOFIX] Changes committed and pushed", flush=True)
-        
-        # Step 8: Generate human-readable PR description
-        print("[AUTOFIX] Step 7: Generating PR description...", flush=True)
-        pr_description = generate_pr_description(patch_content, vulnerability, node_info)
-        print(f"[AUTOFIX] PR description generated: {len(pr_description)} characters", flush=True)
+        # Step 7 + 8: Commit and push changes while Gemini writes the PR description;
+        # the push talks to the git remote and the description to the Gemini API
+        logger.info(f"[AUTOFIX] Step 6: Committing and pushing to branch {branch_name}...")
+        logger.info("[AUTOFIX] Step 7: Generating PR description...")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            description_future = executor.submit(
+                copy_context().run, generate_pr_description, patch_content, vulnerability, node_info,
+                vulnerability_json, node_json
+            )
+            commit_and_push_changes(repo_dir, branch_name, commit_message)
+            logger.info("[AUTOFIX] Changes committed and pushed")
+            pr_description = description_future.result()
+        logger.info(f"[AUTOFIX] PR description generated: {len(pr_description)} characters")
         
         # Step 9: Create pull request
-        print("[AUTOFIX] Step 8: Creating pull request...", flush=True)
+        logger.info("[AUTOFIX] Step 8: Creating pull request...")
         pr_title = f"Auto-fix: Resolve {vuln_id}"
         
         # Append raw data for reference
@@ -515,7 +1563,7 @@ def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] =
 <summary>Raw Vulnerability Data</summary>
 
 ```json
-{json.dumps(vulnerability, indent=2)}
+{vulnerability_json}
 ```
 
 </details>
@@ -524,7 +1572,7 @@ def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] =
 <summary>Raw Node Information</summary>
 
 ```json
-{json.dumps(node_info, indent=2) if node_info else 'N/A'}
+{node_json}
 ```
 
 </details>
@@ -533,7 +1581,7 @@ def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] =
 """
         
         pr_response = create_pull_request(branch_name, title=pr_title, body=pr_body)
-        print(f"[AUTOFIX] Pull request created: #{pr_response['number']}", flush=True)
+        logger.info(f"[AUTOFIX] Pull request created: #{pr_response['number']}")
         
         return {
             "success": True,
@@ -547,9 +1595,7 @@ def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] =
             "patch_size": len(patch_content)
         }
     except Exception as e:
-        print(f"[AUTOFIX] ERROR: {str(e)}", flush=True)
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[AUTOFIX] ERROR: {str(e)}")
         return {
             "success": False,
             "message": f"Failed to fix vulnerability: {str(e)}",
@@ -558,5 +1604,160 @@ def fix_vulnerability(vulnerability: Dict[str, Any], node_info: Dict[str, Any] =
         }
     finally:
         if repo_dir:
-            print(f"[AUTOFIX] Cleaning up repository at {repo_dir}", flush=True)
-            cleanup_repo(repo_dir)
+            logger.info(f"[AUTOFIX] Removing worktree at {repo_dir}")
+            try:
+                remove_worktree(repo_dir)
+            except RuntimeError as e:
+                logger.warning(f"[AUTOFIX] Failed to remove worktree: {e}")
+        _current_vuln_id.reset(vuln_id_token)
+
+
+def fix_vulnerabilities(
+    vulnerabilities: List[Dict[str, Any]],
+    node_info: Dict[str, Any] = None,
+    batch: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Fix several vulnerabilities.
+
+    By default every fix runs concurrently in its own worktree and gets its
+    own pull request, so the clone, Gemini and push latencies of different
+    vulnerabilities overlap. In batch mode all vulnerabilities are fixed
+    with a single Gemini call and land in a single pull request.
+
+    Args:
+        vulnerabilities: The vulnerabilities to fix
+        node_info: Information about the node where the vulnerabilities were found
+        batch: Fix all vulnerabilities with one Gemini call and one pull request
+
+    Returns:
+        The fix results, in the same order as the vulnerabilities
+    """
+    if batch:
+        return _fix_vulnerabilities_batch(vulnerabilities, node_info)
+
+    with ThreadPoolExecutor(max_workers=MAX_FIX_WORKERS) as executor:
+        return list(executor.map(partial(fix_vulnerability, node_info=node_info), vulnerabilities))
+
+
+def _fix_vulnerabilities_batch(vulnerabilities: List[Dict[str, Any]], node_info: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Fix several vulnerabilities in one branch and one pull request.
+
+    Rules are tried first; the remaining vulnerabilities share a single
+    Gemini call. Patches are applied in order and a patch that no longer
+    applies on top of the previous ones is left out of the pull request.
+
+    Args:
+        vulnerabilities: The vulnerabilities to fix
+        node_info: Information about the node where the vulnerabilities were found
+
+    Returns:
+        The fix results, in the same order as the vulnerabilities
+    """
+    def failure(vulnerability: Dict[str, Any], message: str) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "message": message,
+            "vulnerability": vulnerability,
+            "node": node_info
+        }
+
+    repo_dir = None
+    vuln_id_token = _current_vuln_id.set("batch")
+    try:
+        logger.info(f"[AUTOFIX] Starting batch fix for {len(vulnerabilities)} vulnerabilities")
+        commit, files = get_repo_files()
+
+        patches: Dict[str, Tuple[str, str]] = {}
+        remaining = []
+        for vulnerability in vulnerabilities:
+            rule_patch = rules.try_fix(vulnerability, node_info, files)
+            if rule_patch:
+                patches[vulnerability.get('id', 'unknown')] = (rule_patch, f"Rule-based fix for {vulnerability.get('type')}")
+            else:
+                remaining.append(vulnerability)
+        logger.info(f"[AUTOFIX] {len(patches)} vulnerabilities fixed by rules, {len(remaining)} left for Gemini")
+
+        if remaining:
+            context = build_context_string(
+                rank_files_for_vulnerabilities(files, remaining, node_info), max_chars=MAX_CONTEXT_CHARS
+            )
+            for vuln_id, generated in call_gemini_for_batch_patch(context, remaining, node_info).items():
+                patches.setdefault(vuln_id, generated)
+
+        repo_dir = create_worktree(commit)
+        logger.info(f"[AUTOFIX] Worktree created at: {repo_dir}")
+        applied = []
+        for vulnerability in vulnerabilities:
+            patch_content, summary = patches.get(vulnerability.get('id', 'unknown'), (None, None))
+            if patch_content and _patch_applies(repo_dir, patch_content):
+                apply_patch(repo_dir, patch_content)
+                applied.append((vulnerability, summary))
+        if not applied:
+            raise RuntimeError("None of the generated patches apply")
+        logger.info(f"[AUTOFIX] Applied {len(applied)} of {len(vulnerabilities)} patches")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        branch_name = f"autofix/batch-{timestamp}"
+        fixed_ids = [vulnerability.get('id', 'unknown') for vulnerability, _ in applied]
+        commit_message = f"Auto-fix: Resolve {len(applied)} vulnerabilities\n\n" + "\n".join(f"- {vuln_id}" for vuln_id in fixed_ids)
+        commit_and_push_changes(repo_dir, branch_name, commit_message)
+        logger.info("[AUTOFIX] Changes committed and pushed")
+
+        node_json = format_node_info(node_info)
+        fix_list = "\n".join(
+            f"| {vulnerability.get('id', 'N/A')} | {vulnerability.get('severity', 'N/A')} | "
+            f"{vulnerability.get('title') or vulnerability.get('type', 'N/A')} | {summary} |"
+            for vulnerability, summary in applied
+        )
+        pr_body = f"""## Security fixes for {len(applied)} vulnerabilities
+
+| Vulnerability ID | Severity | Issue | Fix |
+| --- | --- | --- | --- |
+{fix_list}
+
+---
+
+<details>
+<summary>Raw Node Information</summary>
+
+```json
+{node_json}
+```
+
+</details>
+
+**Generated:** {timestamp}
+
+*These fixes were automatically generated by Carakube's AI-powered security remediation system.*
+"""
+        pr_response = create_pull_request(branch_name, title=f"Auto-fix: Resolve {len(applied)} vulnerabilities", body=pr_body)
+        logger.info(f"[AUTOFIX] Pull request created: #{pr_response['number']}")
+
+        fixed = set(fixed_ids)
+        return [
+            {
+                "success": True,
+                "message": f"Successfully created PR #{pr_response['number']}",
+                "vulnerability": vulnerability,
+                "node": node_info,
+                "pr_url": pr_response['html_url'],
+                "branch": branch_name,
+                "files_analyzed": len(files)
+            }
+            if vulnerability.get('id', 'unknown') in fixed
+            else failure(vulnerability, "No applicable patch was generated for this vulnerability")
+            for vulnerability in vulnerabilities
+        ]
+    except Exception as e:
+        logger.exception(f"[AUTOFIX] ERROR: {str(e)}")
+        return [failure(vulnerability, f"Failed to fix vulnerability: {str(e)}") for vulnerability in vulnerabilities]
+    finally:
+        if repo_dir:
+            logger.info(f"[AUTOFIX] Removing worktree at {repo_dir}")
+            try:
+                remove_worktree(repo_dir)
+            except RuntimeError as e:
+                logger.warning(f"[AUTOFIX] Failed to remove worktree: {e}")
+        _current_vuln_id.reset(vuln_id_token)
@@ -4,15 +4,42 @@ Git operations for the autofix system.
 
 import subprocess
 import os
+import threading
 from pathlib import Path
 from typing import Dict, Any
 import requests
 
 
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN", "")
+# Passed per commit: worktrees share the cache's .git/config, and concurrent fixes
+# writing it with git config fail on its lock
+GIT_IDENTITY = ["-c", "user.name=Carakube Bot", "-c", "user.email=bot@carakube.local"]
 GITHUB_REPO_OWNER = os.getenv("GITHUB_REPO_OWNER", "SamuelLess")
 GITHUB_REPO_NAME = os.getenv("GITHUB_REPO_NAME", "hackatum-k8s-flux")
 
+# Shared by all fixes so pull requests reuse the keep-alive connection to GitHub
+_github_session = None
+_github_session_lock = threading.Lock()
+
+
+def _get_github_session() -> requests.Session:
+    """Return the session for GitHub API calls, created on first use."""
+    global _github_session
+    with _github_session_lock:
+        if _github_session is None:
+            session = requests.Session()
+            session.headers.update({
+                "Authorization": f"token {ACCESS_TOKEN}",
+                "Accept": "application/vnd.github.v3+json"
+            })
+            _github_session = session
+        return _github_session
+
+
+def _push_url() -> str:
+    """Return the authenticated URL fixes are pushed to."""
+    return f"https://{ACCESS_TOKEN}@github.com/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}.git"
+
 
 def create_test_file(repo_dir: Path) -> None:
     """
@@ -35,22 +62,6 @@ def commit_and_push_changes(repo_dir: Path, branch_name: str, commit_message: st
         commit_message: Commit message (default: "Add test file")
     """
     try:
-        # Configure git user
-        subprocess.run(
-            ["git", "config", "user.name", "Carakube Bot"],
-            cwd=repo_dir,
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        subprocess.run(
-            ["git", "config", "user.email", "bot@carakube.local"],
-            cwd=repo_dir,
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        
         # Create and checkout new branch
         subprocess.run(
             ["git", "checkout", "-b", branch_name],
@@ -71,7 +82,7 @@ def commit_and_push_changes(repo_dir: Path, branch_name: str, commit_message: st
         
         # Commit the changes
         subprocess.run(
-            ["git", "commit", "-m", commit_message],
+            ["git", *GIT_IDENTITY, "commit", "-m", commit_message],
             cwd=repo_dir,
             check=True,
             capture_output=True,
@@ -79,9 +90,8 @@ def commit_and_push_changes(repo_dir: Path, branch_name: str, commit_message: st
         )
         
         # Push to remote with authentication
-        remote_url = f"https://{ACCESS_TOKEN}@github.com/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}.git"
         subprocess.run(
-            ["git", "push", remote_url, branch_name],
+            ["git", "push", _push_url(), branch_name],
             cwd=repo_dir,
             check=True,
             capture_output=True,
@@ -111,10 +121,6 @@ def create_pull_request(
         API response from GitHub
     """
     url = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/pulls"
-    headers = {
-        "Authorization": f"token {ACCESS_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
     data = {
         "title": title,
         "body": body,
@@ -122,6 +128,6 @@ def create_pull_request(
         "base": base_branch
     }
     
-    response = requests.post(url, json=data, headers=headers)
+    response = _get_github_session().post(url, json=data)
     response.raise_for_status()
     return response.json()
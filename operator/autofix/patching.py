@@ -0,0 +1,208 @@
+"""
+In-process application of unified diffs.
+
+The patches produced by the rules and by Gemini are small edits of existing
+text files. Applying them here avoids spawning git apply (or patch) for the
+common case. Anything this applier is not sure about (changed context,
+renames, mode changes, missing trailing newlines, ...) is refused
+without touching the worktree, so the caller can fall back to git apply.
+"""
+
+import re
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# Extended git headers that describe changes beyond line edits
+_UNSUPPORTED_PREFIXES = (
+    "rename ", "copy ", "old mode", "new mode", "similarity ", "dissimilarity ", "Binary ", "GIT binary",
+)
+
+# (old line number, old lines, new lines) of a hunk
+_Hunk = Tuple[int, List[str], List[str]]
+# (path, is_new_file, is_deleted_file, hunks) of a file
+_FilePatch = Tuple[str, bool, bool, List[_Hunk]]
+
+
+def _strip_path(header: str) -> Optional[str]:
+    """Turn a `--- a/path` / `+++ b/path` header into a repository path, like -p1."""
+    path = header[4:].split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return path
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    parts = PurePosixPath(path).parts
+    if not parts or PurePosixPath(path).is_absolute() or ".." in parts:
+        return None
+    return path
+
+
+def _parse_hunk(lines: List[str], index: int, old_count: int, new_count: int) -> Optional[Tuple[int, List[str], List[str]]]:
+    """
+    Read a hunk body starting at `index`, using the header's line counts to find its end.
+
+    Returns:
+        The index after the body with its old and new lines, or None if the body
+        doesn't match the counts
+    """
+    old: List[str] = []
+    new: List[str] = []
+    while len(old) < old_count or len(new) < new_count:
+        if index >= len(lines):
+            return None
+        body = lines[index]
+        if body.startswith("-"):
+            old.append(body[1:])
+        elif body.startswith("+"):
+            # Same as git apply --whitespace=fix
+            new.append(body[1:].rstrip(" \t"))
+        elif body.startswith(" ") or body == "":
+            # Editors and models tend to drop the space of empty context lines
+            old.append(body[1:])
+            new.append(body[1:])
+        else:
+            return None
+        if len(old) > old_count or len(new) > new_count:
+            return None
+        index += 1
+    if index < len(lines) and lines[index].startswith("\\"):
+        return None  # "\ No newline at end of file"
+    return index, old, new
+
+
+def _parse(patch_content: str) -> Optional[List[_FilePatch]]:
+    """
+    Split a unified diff into (path, is_new_file, is_deleted_file, hunks) per file.
+
+    Hunk bodies end where the `@@ -a,b +c,d @@` counts say, so removed or added
+    lines that look like `--- `/`+++ ` headers stay part of the hunk. Diffs whose
+    counts are off are refused and left to git apply --recount.
+
+    Returns:
+        The parsed files, or None if the diff uses anything unsupported
+    """
+    lines = patch_content.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    files: List[_FilePatch] = []
+    hunks: Optional[List[_Hunk]] = None
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if line.startswith("--- ") and index + 1 < len(lines) and lines[index + 1].startswith("+++ "):
+            old_path = _strip_path(line)
+            new_path = _strip_path(lines[index + 1])
+            if old_path is None or new_path is None or old_path == new_path == "/dev/null":
+                return None
+            if "/dev/null" not in (old_path, new_path) and old_path != new_path:
+                return None
+            hunks = []
+            if new_path == "/dev/null":
+                files.append((old_path, False, True, hunks))
+            else:
+                files.append((new_path, old_path == "/dev/null", False, hunks))
+            index += 2
+        elif line.startswith("@@"):
+            match = _HUNK_RE.match(line)
+            if match is None or hunks is None:
+                return None
+            old_count = int(match.group(2) or 1)
+            new_count = int(match.group(4) or 1)
+            parsed = _parse_hunk(lines, index + 1, old_count, new_count)
+            if parsed is None:
+                return None
+            index, old, new = parsed
+            if not old and not files[-1][1]:
+                return None  # Nothing to anchor the hunk on, leave the guessing to git
+            hunks.append((int(match.group(1)), old, new))
+        elif line.startswith(_UNSUPPORTED_PREFIXES):
+            return None
+        elif hunks and line.startswith(("+", "-", " ")):
+            return None  # Body lines past the counts, so the counts are off
+        else:
+            index += 1
+    if not files or any(not file_hunks for _, _, _, file_hunks in files):
+        return None
+    return files
+
+
+def _find(lines: List[str], block: List[str], expected: int, lowest: int) -> Optional[int]:
+    """Return the position closest to `expected` (not before `lowest`) where `block` matches."""
+    if not block:
+        return 0 if not lines else None
+    size = len(block)
+    for distance in range(len(lines) + 1):
+        for position in (expected - distance, expected + distance):
+            if lowest <= position <= len(lines) - size and lines[position:position + size] == block:
+                return position
+    return None
+
+
+def apply_unified_diff(repo_dir: Path, patch_content: str, dry_run: bool = False) -> bool:
+    """
+    Apply a unified diff to a worktree without spawning a process.
+
+    Hunks must match the current file contents exactly, although they may
+    sit at a different line than their header says. Files are only written
+    once every hunk of every file has been placed.
+
+    Args:
+        repo_dir: Path to the repository directory
+        patch_content: The unified diff to apply
+        dry_run: Only check whether the patch would apply
+
+    Returns:
+        True if the patch was applied (or would apply), False if it has to be
+        left to git apply
+    """
+    files = _parse(patch_content)
+    if files is None:
+        return False
+
+    # None marks a file to delete
+    results: Dict[Path, Optional[str]] = {}
+    for path, is_new, is_deleted, hunks in files:
+        target = repo_dir / path
+        if target in results:
+            return False
+        if is_new:
+            if target.exists() or len(hunks) != 1 or hunks[0][1]:
+                return False
+            lines: List[str] = []
+        else:
+            try:
+                # Bytes, so CRLF files are compared (and refused) as they are
+                text = target.read_bytes().decode("utf-8")
+            except (OSError, UnicodeDecodeError):
+                return False
+            if not text.endswith("\n"):
+                return False
+            lines = text[:-1].split("\n")
+            if is_deleted:
+                if len(hunks) != 1 or hunks[0][2] or hunks[0][1] != lines:
+                    return False
+                results[target] = None
+                continue
+
+        # Each hunk is searched after the previous one, shifted by the lines it added or removed
+        offset = 0
+        lowest = 0
+        for old_start, old, new in hunks:
+            expected = max(old_start - 1, 0) + offset
+            position = _find(lines, old, expected, lowest)
+            if position is None:
+                return False
+            lines[position:position + len(old)] = new
+            offset += len(new) - len(old)
+            lowest = position + len(new)
+        results[target] = "".join(f"{line}\n" for line in lines)
+
+    if not dry_run:
+        for target, text in results.items():
+            if text is None:
+                target.unlink()
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(text.encode("utf-8"))
+    return True
@@ -0,0 +1,305 @@
+"""
+Deterministic fixes for common vulnerability types.
+
+Most findings map to a small, well-known manifest change (drop privileged
+mode, add resource limits, ...). These rules produce the patch directly from
+the workload's manifest instead of asking Gemini, so a covered fix needs no
+context build and no LLM round-trip. Manifests are edited as text so the
+rest of the file (comments, ordering, quoting) stays untouched.
+"""
+
+import difflib
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Kinds whose pod spec we know how to find
+WORKLOAD_KINDS = frozenset({"Pod", "Deployment", "StatefulSet", "DaemonSet", "ReplicaSet", "Job", "CronJob"})
+
+# Limits added to containers without any resources section
+DEFAULT_RESOURCES = {
+    "limits": {"cpu": "500m", "memory": "256Mi"},
+    "requests": {"cpu": "100m", "memory": "128Mi"},
+}
+
+_KIND_RE = re.compile(r"^kind:\s*['\"]?(\w+)['\"]?\s*$")
+_KEY_RE = re.compile(r"^(\s*)(?:-\s+)?([\w.-]+):\s*(.*?)\s*$")
+
+# Pod-level boolean fields that a finding asks to switch off
+_POD_FLAG_FIELDS = {
+    "host_network": "hostNetwork",
+    "host_pid": "hostPID",
+    "host_ipc": "hostIPC",
+}
+
+
+class _Manifest:
+    """A single YAML document of a repository file, as a mutable list of lines."""
+
+    def __init__(self, path: str, lines: List[str], start: int, end: int):
+        self.path = path
+        self.lines = lines
+        self.start = start
+        self.end = end
+
+    def find_key(self, key: str, begin: int, end: int, indent: int) -> Optional[int]:
+        """Return the index of the first `key:` line at exactly `indent` in [begin, end)."""
+        for index in range(begin, end):
+            match = _KEY_RE.match(self.lines[index])
+            if match and match.group(2) == key and _key_indent(self.lines[index]) == indent:
+                return index
+        return None
+
+    def block_end(self, index: int) -> int:
+        """Return the index after the last line nested below the line at `index`."""
+        indent = _indent(self.lines[index])
+        header_is_item = self.lines[index].lstrip().startswith("- ")
+        end = index + 1
+        while end < self.end:
+            line = self.lines[end]
+            if line.strip() and not line.lstrip().startswith("#"):
+                # A list may sit at its parent key's indentation ("containers:\n- name: app")
+                compact_item = _indent(line) == indent and line.lstrip().startswith("- ") and not header_is_item
+                if _indent(line) <= indent and not compact_item:
+                    break
+            end += 1
+        # Trailing blank lines belong to whatever follows
+        while end > index + 1 and not self.lines[end - 1].strip():
+            end -= 1
+        return end
+
+    def containers_line(self) -> Optional[int]:
+        """Return the index of the pod spec's `containers:` line."""
+        for index in range(self.start, self.end):
+            match = _KEY_RE.match(self.lines[index])
+            if match and match.group(2) == "containers" and not match.group(3):
+                return index
+        return None
+
+    def container_block(self, name: str) -> Optional[Tuple[int, int, int]]:
+        """
+        Locate a container of the pod spec.
+
+        Returns:
+            Tuple of (first line, end line, indentation of the container's keys), or None
+        """
+        containers = self.containers_line()
+        if containers is None:
+            return None
+
+        end = self.block_end(containers)
+        index = containers + 1
+        while index < end:
+            line = self.lines[index]
+            if line.lstrip().startswith("- "):
+                item_end = index + 1
+                dash_indent = _indent(line)
+                while item_end < end and not (
+                    self.lines[item_end].lstrip().startswith("- ") and _indent(self.lines[item_end]) == dash_indent
+                ):
+                    item_end += 1
+                key_indent = dash_indent + 2
+                name_line = self.find_key("name", index, item_end, key_indent)
+                if name_line is not None and _unquote(_KEY_RE.match(self.lines[name_line]).group(3)) == name:
+                    while item_end > index + 1 and not self.lines[item_end - 1].strip():
+                        item_end -= 1
+                    return index, item_end, key_indent
+                index = item_end
+            else:
+                index += 1
+        return None
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _key_indent(line: str) -> int:
+    """Indentation of a key, counting a leading list dash as indentation."""
+    stripped = line.lstrip(" ")
+    if stripped.startswith("- "):
+        return _indent(line) + 2
+    return _indent(line)
+
+
+def _unquote(value: str) -> str:
+    return value.strip().strip("'\"")
+
+
+def _candidate_names(node_info: Dict[str, Any]) -> List[str]:
+    """
+    Possible workload names for a graph node, most specific first.
+
+    Pods carry generated suffixes (`web-7d9f8-abcde` for Deployments,
+    `web-0`/`web-abcde` for StatefulSets and DaemonSets) that never appear in
+    the manifests.
+    """
+    label = (node_info or {}).get("label") or ""
+    if not label:
+        return []
+    names = [label]
+    if (node_info or {}).get("type") == "pod":
+        names.extend(label.rsplit("-", count)[0] for count in (1, 2) if label.count("-") >= count)
+    return names
+
+
+def find_workload(files: List[Tuple[str, str]], node_info: Dict[str, Any]) -> Optional[_Manifest]:
+    """
+    Find the manifest document that defines the workload behind a graph node.
+
+    Args:
+        files: List of tuples containing (relative_path, file_content)
+        node_info: Information about the node where the vulnerability was found
+
+    Returns:
+        The matching manifest document, or None if no unique match exists
+    """
+    for name in _candidate_names(node_info):
+        matches = []
+        for file_path, content in files:
+            if not file_path.endswith((".yaml", ".yml")) or name not in content:
+                continue
+            lines = content.splitlines(keepends=True)
+            for start, end in _documents(lines):
+                if _document_matches(lines, start, end, name):
+                    matches.append(_Manifest(file_path, lines, start, end))
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            return None  # Ambiguous, leave it to the model
+    return None
+
+
+def _documents(lines: List[str]) -> List[Tuple[int, int]]:
+    """Split a YAML stream into (start, end) line ranges of its documents."""
+    documents = []
+    start = 0
+    for index, line in enumerate(lines):
+        if line.rstrip() == "---":
+            documents.append((start, index))
+            start = index + 1
+    documents.append((start, len(lines)))
+    return documents
+
+
+def _document_matches(lines: List[str], start: int, end: int, name: str) -> bool:
+    kind = None
+    metadata_name = None
+    in_metadata = False
+    for line in lines[start:end]:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if _indent(line) == 0:
+            in_metadata = line.rstrip() == "metadata:"
+            match = _KIND_RE.match(line)
+            if match:
+                kind = match.group(1)
+        elif in_metadata and metadata_name is None:
+            match = _KEY_RE.match(line)
+            if match and match.group(2) == "name" and _indent(line) == 2:
+                metadata_name = _unquote(match.group(3))
+    return kind in WORKLOAD_KINDS and metadata_name == name
+
+
+def _fix_privileged(manifest: _Manifest, vulnerability: Dict[str, Any]) -> bool:
+    block = manifest.container_block(vulnerability.get("container") or "")
+    if block is None:
+        return False
+    start, end, _ = block
+    for index in range(start, end):
+        line = manifest.lines[index]
+        match = _KEY_RE.match(line)
+        if match and match.group(2) == "privileged" and match.group(3) == "true":
+            manifest.lines[index] = line.replace("true", "false", 1)
+            return True
+    return False
+
+
+def _fix_resource_limits(manifest: _Manifest, vulnerability: Dict[str, Any]) -> bool:
+    block = manifest.container_block(vulnerability.get("container") or "")
+    if block is None:
+        return False
+    start, end, key_indent = block
+    if manifest.find_key("resources", start, end, key_indent) is not None:
+        return False  # Partially configured, needs more judgement than a template
+
+    pad = " " * key_indent
+    added = [f"{pad}resources:\n"]
+    for section, values in DEFAULT_RESOURCES.items():
+        added.append(f"{pad}  {section}:\n")
+        added.extend(f"{pad}    {key}: {value}\n" for key, value in values.items())
+    manifest.lines[end:end] = added
+    return True
+
+
+def _set_pod_flag(manifest: _Manifest, field: str, insert_missing: bool) -> bool:
+    containers = manifest.containers_line()
+    if containers is None:
+        return False
+    indent = _indent(manifest.lines[containers])
+    spec_start = containers
+    while spec_start > manifest.start and (
+        not manifest.lines[spec_start - 1].strip() or _indent(manifest.lines[spec_start - 1]) >= indent
+    ):
+        spec_start -= 1
+    spec_end = manifest.block_end(spec_start - 1) if spec_start > manifest.start else manifest.end
+
+    index = manifest.find_key(field, spec_start, spec_end, indent)
+    if index is not None:
+        line = manifest.lines[index]
+        if _KEY_RE.match(line).group(3) != "true":
+            return False
+        manifest.lines[index] = line.replace("true", "false", 1)
+        return True
+    if not insert_missing:
+        return False
+    manifest.lines.insert(containers, f"{' ' * indent}{field}: false\n")
+    return True
+
+
+def _fix_pod_flag(manifest: _Manifest, vulnerability: Dict[str, Any]) -> bool:
+    return _set_pod_flag(manifest, _POD_FLAG_FIELDS[vulnerability.get("type")], insert_missing=False)
+
+
+def _fix_automounted_token(manifest: _Manifest, vulnerability: Dict[str, Any]) -> bool:
+    return _set_pod_flag(manifest, "automountServiceAccountToken", insert_missing=True)
+
+
+# Rule per vulnerability type; each edits the manifest in place and reports whether it changed
+RULES: Dict[str, Callable[[_Manifest, Dict[str, Any]], bool]] = {
+    "privileged_container": _fix_privileged,
+    "missing_resource_limits": _fix_resource_limits,
+    "automounted_sa_token": _fix_automounted_token,
+    **{vuln_type: _fix_pod_flag for vuln_type in _POD_FLAG_FIELDS},
+}
+
+
+def try_fix(vulnerability: Dict[str, Any], node_info: Dict[str, Any], files: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    Produce a patch for a vulnerability without calling Gemini.
+
+    Args:
+        vulnerability: The vulnerability data
+        node_info: Information about the node where the vulnerability was found
+        files: List of tuples containing (relative_path, file_content) of the repository
+
+    Returns:
+        A unified diff fixing the vulnerability, or None if no rule applies
+    """
+    rule = RULES.get(vulnerability.get("type"))
+    if rule is None:
+        return None
+
+    manifest = find_workload(files, node_info)
+    if manifest is None or not manifest.lines or not manifest.lines[-1].endswith("\n"):
+        return None
+
+    original = list(manifest.lines)
+    if not rule(manifest, vulnerability):
+        return None
+
+    return "".join(difflib.unified_diff(
+        original,
+        manifest.lines,
+        fromfile=f"a/{manifest.path}",
+        tofile=f"b/{manifest.path}",
+    ))
@@ -1,25 +1,201 @@
-import json
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+import orjson
 import uvicorn
+from watchfiles import awatch
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, NamedTuple, Tuple
 
-from autofix import fix_vulnerability
+from autofix import MAX_FIX_WORKERS, fix_vulnerability, prewarm
 from vulnerability_state import (
     get_all_states,
     get_vulnerability_state,
-    update_vulnerability_state,
+    vulnerability_transition,
 )
 
-app = FastAPI(title="Carakube Operator API")
+# Goes through the queue handler autofix installs on the root logger, so request
+# handlers never block on stream writes
+logger = logging.getLogger(__name__)
+# watchfiles logs every change at INFO, i.e. every scan in every worker
+logging.getLogger("watchfiles").setLevel(logging.WARNING)
+
+app = FastAPI(title="Carakube Operator API", default_response_class=ORJSONResponse)
 GRAPH_OUTPUT_FILE = Path("/app/scanner_output/cluster_graph.json")
 
 
+def _load_graph() -> Tuple[bytes, Dict[str, Any]]:
+    """Read the scan report written by the scanner, as raw bytes and parsed."""
+    raw = GRAPH_OUTPUT_FILE.read_bytes()
+    return raw, orjson.loads(raw)
+
+
+class NodeInfo(NamedTuple):
+    """The node fields passed to autofix along with a vulnerability."""
+
+    id: Optional[str]
+    label: Optional[str]
+    type: Optional[str]
+    namespace: Optional[str]
+
+
+# Vulnerability ID -> (vulnerability, node_info)
+VulnerabilityIndex = Dict[str, Tuple[Dict[str, Any], NodeInfo]]
+
+
+def _node_info(node: Dict[str, Any]) -> NodeInfo:
+    """Extract the node fields passed to autofix along with a vulnerability."""
+    return NodeInfo(node.get("id"), node.get("label"), node.get("type"), node.get("namespace"))
+
+
+def _index_vulnerabilities(graph_data: Dict[str, Any]) -> VulnerabilityIndex:
+    """Map each vulnerability ID to its first (vulnerability, node_info) in the graph."""
+    index: VulnerabilityIndex = {}
+    for node in graph_data.get("nodes", []):
+        vulnerabilities = node.get("vulnerabilities")
+        if not vulnerabilities:
+            continue
+        node_info = _node_info(node)
+        for vuln in vulnerabilities:
+            index.setdefault(vuln.get("id"), (vuln, node_info))
+    return index
+
+
+class GraphCache(NamedTuple):
+    """A loaded scan report, keyed by the file's (mtime, size)."""
+
+    key: Tuple[int, int]
+    raw: bytes
+    data: Dict[str, Any]
+    index: VulnerabilityIndex
+
+
+def _parse_graph(key: Tuple[int, int]) -> GraphCache:
+    """Load the scan report and index its vulnerabilities."""
+    raw, graph_data = _load_graph()
+    return GraphCache(key, raw, graph_data, _index_vulnerabilities(graph_data))
+
+
+# Last loaded scan report; reparsed only after the scanner rewrote the file
+_graph_cache: Optional[GraphCache] = None
+_graph_cache_lock: Optional[asyncio.Lock] = None
+# Seconds a loaded report is served without checking the file again; the scanner
+# rewrites it at most every few seconds
+GRAPH_STAT_TTL = 0.5
+_graph_checked_at = 0.0
+# Set while _watch_graph keeps _graph_cache up to date, so requests skip the check entirely
+_graph_watched = False
+
+
+def _get_graph_cache_lock() -> asyncio.Lock:
+    global _graph_cache_lock
+    if _graph_cache_lock is None:
+        # Created lazily so it belongs to the running event loop
+        _graph_cache_lock = asyncio.Lock()
+    return _graph_cache_lock
+
+
+async def _refresh_graph_cache() -> GraphCache:
+    """Stat the scan report and reparse it if it changed; the caller holds the cache lock."""
+    global _graph_cache, _graph_checked_at
+    now = time.monotonic()
+    stat = await asyncio.to_thread(GRAPH_OUTPUT_FILE.stat)
+    key = (stat.st_mtime_ns, stat.st_size)
+    if _graph_cache is None or _graph_cache.key != key:
+        _graph_cache = await asyncio.to_thread(_parse_graph, key)
+    _graph_checked_at = now
+    return _graph_cache
+
+
+async def _get_graph_cache() -> GraphCache:
+    """
+    Return the cached scan report, reparsing it if the file changed.
+
+    While _watch_graph runs the cached report is returned as is. Otherwise the
+    file is checked at most every GRAPH_STAT_TTL seconds. Concurrent requests
+    after a rewrite wait for a single reparse.
+    """
+    async with _get_graph_cache_lock():
+        if _graph_cache is not None and (
+            _graph_watched or time.monotonic() - _graph_checked_at < GRAPH_STAT_TTL
+        ):
+            return _graph_cache
+        return await _refresh_graph_cache()
+
+
+async def _watch_graph() -> None:
+    """
+    Reload the scan report each time the scanner writes it.
+
+    Runs for the lifetime of the app. If the watch fails, requests go back
+    to checking the file themselves.
+    """
+    global _graph_watched
+    try:
+        async with _get_graph_cache_lock():
+            try:
+                await _refresh_graph_cache()
+            except (OSError, ValueError):
+                pass  # No complete scan yet, the next write shows up as a change
+            _graph_watched = True
+        async for changes in awatch(GRAPH_OUTPUT_FILE.parent):
+            if not any(Path(path).name == GRAPH_OUTPUT_FILE.name for _, path in changes):
+                continue
+            async with _get_graph_cache_lock():
+                try:
+                    await _refresh_graph_cache()
+                except (OSError, ValueError) as e:
+                    # Usually a write still in progress; its last change triggers another reload
+                    logger.warning("Could not reload scan report: %s", e)
+    except Exception as e:
+        logger.warning("Watching the scan report failed, checking it per request: %s", e)
+    finally:
+        _graph_watched = False
+
+
+async def _get_graph() -> Dict[str, Any]:
+    """Return the parsed scan report, reusing the last parse while the file is unchanged."""
+    return (await _get_graph_cache()).data
+
+
+async def _run_fix(vulnerability: Dict[str, Any], node_info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run a fix on the app's fix executor.
+
+    Fixes clone, call Gemini and push, so they run off the event loop. Their
+    own bounded pool keeps a burst of fixes from occupying the default
+    executor that file reads use.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.fix_executor, fix_vulnerability, vulnerability, node_info)
+
+
+def _first_vulnerability(
+    index: VulnerabilityIndex, states: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[NodeInfo]]:
+    """
+    Return the first vulnerability of the scan report, in report order.
+
+    Args:
+        index: The scan report's vulnerability index
+        states: Vulnerability states; if given, vulnerabilities that are not
+            untouched are skipped
+
+    Returns:
+        Tuple of (vulnerability, node_info), or (None, None) if there is none
+    """
+    for vuln_id, (vulnerability, node_info) in index.items():
+        if states is None or states.get(vuln_id, {}).get("state", "untouched") == "untouched":
+            return vulnerability, node_info
+    return None, None
+
+
 @app.get("/test")
 async def test_endpoint():
     """Test endpoint for quick verification"""
-    import time
-
     return {
         "message": "Test endpoint working!",
         "timestamp": time.time(),
@@ -31,37 +207,43 @@ async def test_endpoint():
 async def get_graph():
     """Get cluster topology graph with nodes and links"""
     try:
-        if GRAPH_OUTPUT_FILE.exists():
-            with open(GRAPH_OUTPUT_FILE, "r") as f:
-                data = json.load(f)
-
-            # Check if cluster is initializing (has data file but no nodes)
-            nodes = data.get("nodes", [])
-            timestamp = data.get("timestamp")
-
-            if len(nodes) == 0:
-                # If we have a recent timestamp but no nodes, cluster is still initializing
-                # If timestamp exists, it means scanner ran but found nothing (Kubernetes API not ready)
-                if timestamp:
-                    return {
-                        "status": "initializing",
-                        "message": "Kubernetes API is starting up. Waiting for nodes to become available...",
-                        "data": data,
-                    }
-                else:
-                    # No timestamp means this is genuinely an empty result
-                    return {
-                        "status": "empty",
-                        "message": "Cluster appears to be empty (no resources found)",
-                        "data": data,
-                    }
-
-            return {"status": "success", "data": data}
-        else:
+        try:
+            # File access and parsing run in a worker thread to keep the event loop free
+            graph = await _get_graph_cache()
+        except FileNotFoundError:
             return {
                 "status": "waiting",
                 "message": "Waiting for initial scan to complete...",
             }
+
+        # Check if cluster is initializing (has data file but no nodes)
+        data = graph.data
+        nodes = data.get("nodes", [])
+        timestamp = data.get("timestamp")
+
+        if len(nodes) == 0:
+            # If we have a recent timestamp but no nodes, cluster is still initializing
+            # If timestamp exists, it means scanner ran but found nothing (Kubernetes API not ready)
+            if timestamp:
+                return {
+                    "status": "initializing",
+                    "message": "Kubernetes API is starting up. Waiting for nodes to become available...",
+                    "data": data,
+                }
+            else:
+                # No timestamp means this is genuinely an empty result
+                return {
+                    "status": "empty",
+                    "message": "Cluster appears to be empty (no resources found)",
+                    "data": data,
+                }
+
+        # The scanner's file already is the JSON of "data", so send it as is instead of
+        # serializing the parsed graph again
+        return Response(
+            content=b'{"status":"success","data":' + graph.raw + b"}",
+            media_type="application/json",
+        )
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
@@ -111,77 +293,51 @@ async def fix_specific_vulnerability_endpoint(vuln_id: str):
         Result of the fix operation
     """
     try:
-        # Check if scan report exists
-        if not GRAPH_OUTPUT_FILE.exists():
+        # Find the specific vulnerability in the scan report's index
+        try:
+            vuln_index = (await _get_graph_cache()).index
+        except FileNotFoundError:
             raise HTTPException(
                 status_code=404, detail="No scan report available. Run a scan first."
             )
-
-        # Load the scan report
-        with open(GRAPH_OUTPUT_FILE, "r") as f:
-            graph_data = json.load(f)
-
-        # Find the specific vulnerability in the graph
-        vulnerability = None
-        node_info: Optional[Dict[str, Any]] = None
-
-        nodes = graph_data.get("nodes", [])
-        for node in nodes:
-            if "vulnerabilities" in node:
-                for vuln in node["vulnerabilities"]:
-                    if vuln.get("id") == vuln_id:
-                        vulnerability = vuln
-                        node_info = {
-                            "id": node.get("id"),
-                            "label": node.get("label"),
-                            "type": node.get("type"),
-                            "namespace": node.get("namespace"),
-                        }
-                        break
-            if vulnerability:
-                break
+        vulnerability, indexed_node = vuln_index.get(vuln_id, (None, None))
 
         if not vulnerability:
             raise HTTPException(
                 status_code=404,
                 detail=f"Vulnerability with ID {vuln_id} not found in scan report",
             )
-
-        # Update state to in_processing
-        print(f"[API] Setting vulnerability {vuln_id} to in_processing", flush=True)
-        update_vulnerability_state(vuln_id, "in_processing")
+        node_info: Dict[str, Any] = indexed_node._asdict()
 
         try:
-            # Pass to fix function with context
-            print(f"[API] Starting fix for vulnerability {vuln_id}", flush=True)
-            # fix_vulnerability expects node_info to be Dict[str, Any] but has default=None
-            # So we pass it directly (the type annotation is incorrect in autofix module)
-            result = fix_vulnerability(vulnerability, node_info)  # type: ignore
-
-            # Update state based on result
-            if result.get("success"):
-                pr_url = result.get("pr_url")
-                print(f"[API] Fix successful, PR URL: {pr_url}", flush=True)
-                update_vulnerability_state(vuln_id, "pr_available", pr_url=pr_url)
-                return {
-                    "status": "success",
-                    "message": f"Successfully created PR for vulnerability {vuln_id}",
-                    "result": result,
-                    "state": {"state": "pr_available", "pr_url": pr_url},
-                }
-            else:
-                # If fix failed, reset to untouched
-                print(f"[API] Fix failed: {result.get('message')}", flush=True)
-                update_vulnerability_state(vuln_id, "untouched")
-                return {
-                    "status": "error",
-                    "message": result.get("message", "Fix failed"),
-                    "result": result,
-                }
+            # in_processing while the fix runs; the final state is written once when it is done,
+            # and it falls back to untouched unless the fix succeeds
+            logger.info("[API] Setting vulnerability %s to in_processing", vuln_id)
+            with vulnerability_transition(vuln_id) as transition:
+                # Pass to fix function with context
+                logger.info("[API] Starting fix for vulnerability %s", vuln_id)
+                result = await _run_fix(vulnerability, node_info)
+
+                # Update state based on result
+                if result.get("success"):
+                    pr_url = result.get("pr_url")
+                    logger.info("[API] Fix successful, PR URL: %s", pr_url)
+                    transition.set("pr_available", pr_url=pr_url)
+                    return {
+                        "status": "success",
+                        "message": f"Successfully created PR for vulnerability {vuln_id}",
+                        "result": result,
+                        "state": {"state": "pr_available", "pr_url": pr_url},
+                    }
+                else:
+                    logger.warning("[API] Fix failed: %s", result.get("message"))
+                    return {
+                        "status": "error",
+                        "message": result.get("message", "Fix failed"),
+                        "result": result,
+                    }
         except Exception as fix_error:
-            # If exception occurs, reset to untouched
-            print(f"[API] Fix exception: {str(fix_error)}", flush=True)
-            update_vulnerability_state(vuln_id, "untouched")
+            logger.error("[API] Fix exception: %s", fix_error)
             raise HTTPException(
                 status_code=500, detail=f"Failed to fix vulnerability: {str(fix_error)}"
             )
@@ -193,43 +349,26 @@ async def fix_specific_vulnerability_endpoint(vuln_id: str):
 
 
 @app.post("/api/autofix/fix/")
-async def fix_vulnerability_endpoint():
+async def fix_vulnerability_endpoint(skip_touched: bool = False):
     """
     Fix the first vulnerability found in the scan report.
 
-    Reads cluster_graph.json, finds the first vulnerability from any node,
-    and passes it to the fix function.
+    Takes the first vulnerability from the scan report's index
+    and passes it to the fix function. With skip_touched, vulnerabilities
+    whose fix is in progress or whose PR exists are passed over.
 
     DEPRECATED: Use /api/vulnerability-fix/{vuln_id} instead
     """
     try:
-        # Check if scan report exists
-        if not GRAPH_OUTPUT_FILE.exists():
+        try:
+            vuln_index = (await _get_graph_cache()).index
+        except FileNotFoundError:
             return {
                 "status": "error",
                 "message": "No scan report available. Run a scan first.",
             }
-
-        # Load the scan report
-        with open(GRAPH_OUTPUT_FILE, "r") as f:
-            graph_data = json.load(f)
-
-        # Find the first vulnerability in the graph
-        # The file has nodes directly at top level, not wrapped in "data"
-        vulnerability = None
-        node_info: Optional[Dict[str, Any]] = None
-
-        nodes = graph_data.get("nodes", [])
-        for node in nodes:
-            if "vulnerabilities" in node and len(node["vulnerabilities"]) > 0:
-                vulnerability = node["vulnerabilities"][0]
-                node_info = {
-                    "id": node.get("id"),
-                    "label": node.get("label"),
-                    "type": node.get("type"),
-                    "namespace": node.get("namespace"),
-                }
-                break
+        states = await asyncio.to_thread(get_all_states) if skip_touched else None
+        vulnerability, indexed_node = _first_vulnerability(vuln_index, states)
 
         if not vulnerability:
             return {
@@ -237,23 +376,13 @@ async def fix_vulnerability_endpoint():
                 "message": "No vulnerabilities found in scan report",
             }
 
-        vuln_id = vulnerability.get("id")
-        if vuln_id:
-            # Update state to in_processing
-            update_vulnerability_state(vuln_id, "in_processing")
-
-        # Pass to fix function with context
-        # fix_vulnerability expects node_info to be Dict[str, Any] but has default=None
-        # So we pass it directly (the type annotation is incorrect in autofix module)
-        result = fix_vulnerability(vulnerability, node_info)  # type: ignore
+        # in_processing while the fix runs, untouched again unless it succeeds
+        with vulnerability_transition(vulnerability.get("id")) as transition:
+            # Pass to fix function with context
+            result = await _run_fix(vulnerability, indexed_node._asdict())
 
-        # Update state based on result
-        if vuln_id and result.get("success"):
-            pr_url = result.get("pr_url")
-            update_vulnerability_state(vuln_id, "pr_available", pr_url=pr_url)
-        elif vuln_id:
-            # Reset to untouched if failed
-            update_vulnerability_state(vuln_id, "untouched")
+            if result.get("success"):
+                transition.set("pr_available", pr_url=result.get("pr_url"))
 
         return result
 
@@ -267,8 +396,22 @@ async def fix_vulnerability_endpoint():
 @app.on_event("startup")
 async def startup_event():
     """Startup event"""
-    print("🚀 Operator API started on port 8000 🌟", flush=True)
+    logger.info("🚀 Operator API started on port 8000 🌟")
+    # Fixes are I/O bound and share autofix's per-process caches, so threads rather than processes
+    app.state.fix_executor = ThreadPoolExecutor(max_workers=MAX_FIX_WORKERS, thread_name_prefix="autofix")
+    # Clone and index the fix repository in the background instead of in the first fix request
+    app.state.prewarm_task = asyncio.create_task(asyncio.to_thread(prewarm))
+    # Keeps the scan report loaded so graph requests don't touch the file
+    app.state.graph_watch_task = asyncio.create_task(_watch_graph())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Shutdown event"""
+    app.state.graph_watch_task.cancel()
+    app.state.fix_executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # "auto" picks uvloop and httptools, installed with uvicorn[standard]
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto", http="auto")
@@ -1,17 +1,128 @@
 """Cluster scanner module for monitoring Kubernetes cluster status"""
-import json
+import os
+import re
+import stat
+import tempfile
+import threading
+import time
 import urllib3
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 from kubernetes import client, config
 from kubernetes.client import CustomObjectsApi
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import orjson
+
+from .graph_builder import ClusterGraphBuilder
+from .resource_cache import ACCEPT_GZIP, ResourceCache
 
 # Disable SSL warnings for internal cluster communication
 # The Kubernetes Python client uses the service account token and CA cert
 # from /var/run/secrets/kubernetes.io/serviceaccount/ for authentication
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Connections kept open to the API server. The Python client has no client-side QPS
+# limit like client-go; requests beyond the pool open a fresh TLS connection and throw
+# it away afterwards, and the resource cache's watches hold one connection each
+KUBE_CONNECTION_POOL_SIZE = int(os.getenv("CARAKUBE_KUBE_POOL_SIZE", "20"))
+
+# Seconds the cluster's pod and node metrics are reused across graph builds;
+# metrics-server only samples every 15 seconds or so
+METRICS_TTL = 10.0
+
+# Objects per page of a direct list, so a large cluster's response is never held in one piece
+LIST_PAGE_SIZE = 500
+
+# System namespaces to exclude from security scans to avoid false positives
+_SYSTEM_NAMESPACES = frozenset({"kube-system", "kube-public", "kube-node-lease", "local-path-storage"})
+# Filters them out on the API server, so their objects are never sent
+_NOT_IN_SYSTEM_NAMESPACE = ",".join(f"metadata.namespace!={ns}" for ns in sorted(_SYSTEM_NAMESPACES))
+_NOT_SYSTEM_NAMESPACE = ",".join(f"metadata.name!={ns}" for ns in sorted(_SYSTEM_NAMESPACES))
+# ConfigMaps in kube-system are still scanned for hidden flags
+_CONFIGMAP_FIELD_SELECTOR = "metadata.namespace!=kube-node-lease,metadata.namespace!=kube-public"
+
+# Capabilities that give a container (near) host-level control
+_DANGEROUS_CAPS = frozenset({"SYS_ADMIN", "NET_ADMIN", "SYS_MODULE", "DAC_READ_SEARCH"})
+
+# System/managed roles to exclude (they are expected to be powerful)
+_EXCLUDED_ROLES = frozenset({
+    "cluster-admin",
+    "admin",
+    "edit",
+    "view",
+    # Flux controllers need wide permissions to reconcile manifests
+    "crd-controller-flux-system",
+    "kustomize-controller-flux-system",
+    "helm-controller-flux-system",
+    "notification-controller-flux-system",
+    "source-controller-flux-system",
+    "flux-view-flux-system",
+    "flux-read-flux-system",
+    "flux-edit-flux-system",
+    "local-path-provisioner-role",
+})
+# Field selectors have no prefix match, so system:* roles are still skipped client-side
+_NOT_EXCLUDED_ROLE = ",".join(f"metadata.name!={name}" for name in sorted(_EXCLUDED_ROLES))
+_READ_ONLY_VERBS = frozenset({"get", "list", "watch"})
+
+# Trusted registries
+_TRUSTED_REGISTRIES = (
+    "docker.io",
+    "gcr.io",
+    "ghcr.io",
+    "registry.k8s.io",
+    "k8s.gcr.io",
+    "quay.io",
+    "mcr.microsoft.com",
+    "public.ecr.aws",
+)
+# A registry ending in a trusted one (exact or suffix match), or AWS ECR (*.dkr.ecr.*.amazonaws.com)
+_TRUSTED_REGISTRY_RE = re.compile(
+    "(?:" + "|".join(map(re.escape, _TRUSTED_REGISTRIES)) + r")$|dkr\.ecr.*amazonaws\.com"
+)
+
+# Substrings of names and values that suggest a secret or CTF flag
+_SENSITIVE_KEYWORDS = ("password", "secret", "key", "token", "flag", "credential")
+
+
+def _is_sensitive(text: str) -> bool:
+    """Whether text mentions one of the sensitive keywords, lowercasing it only once"""
+    text = text.lower()
+    return any(k in text for k in _SENSITIVE_KEYWORDS)
+
+
+def _utc_now_z() -> str:
+    """Current UTC time as an ISO 8601 string ending in Z"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _dump_json(data: Any) -> bytes:
+    """Encode JSON with orjson, which also accepts non-string dict keys"""
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _file_mode(path: Path) -> int:
+    """Permission bits of an existing file, or 0644 for a new one"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o644
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file through a temporary file renamed over it, so readers never see it half-written"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        # mkstemp creates the file 0600; keep the mode readers in other users rely on
+        os.fchmod(fd, _file_mode(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 
 class ClusterScanner:
     """Advanced scanner for cluster security analysis"""
@@ -20,6 +131,15 @@ class ClusterScanner:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.graph_file = self.output_dir / "cluster_graph.json"
+        # Set by start_resource_cache; the scans call the API directly without it
+        self.resource_cache: Optional[ResourceCache] = None
+        # Resource version of the last direct list of each kind
+        self._resource_versions: Dict[str, str] = {}
+        # Last successful result of each scan, reported again while the scan fails
+        self._last_scans: Dict[str, Dict[str, Any]] = {}
+        # "pods"/"nodes" -> (listed at, (namespace, name) -> metrics)
+        self._metrics_cache: Dict[str, Tuple[float, Dict[Tuple[Optional[str], str], Dict[str, Any]]]] = {}
+        self._metrics_cache_lock = threading.Lock()
         self._init_k8s_clients()
     
     def _init_k8s_clients(self):
@@ -32,37 +152,95 @@ class ClusterScanner:
             except config.config_exception.ConfigException:
                 raise RuntimeError("Cannot load Kubernetes config")
         
-        self.v1_api = client.CoreV1Api()
-        self.apps_api = client.AppsV1Api()
-        self.rbac_api = client.RbacAuthorizationV1Api()
-        self.networking_api = client.NetworkingV1Api()
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = KUBE_CONNECTION_POOL_SIZE
+        # One client for all API groups, so they share a single pool of keep-alive connections
+        # instead of each opening its own
+        self.api_client = client.ApiClient(configuration)
+        
+        self.v1_api = client.CoreV1Api(self.api_client)
+        self.apps_api = client.AppsV1Api(self.api_client)
+        self.rbac_api = client.RbacAuthorizationV1Api(self.api_client)
+        self.networking_api = client.NetworkingV1Api(self.api_client)
         
         # Try to initialize metrics API (may not be available)
         try:
-            self.metrics_api = CustomObjectsApi()
+            self.metrics_api = CustomObjectsApi(self.api_client)
             self.has_metrics = True
         except Exception:
             self.metrics_api = None
             self.has_metrics = False
     
+    def start_resource_cache(self) -> None:
+        """Follow the objects the scans read through watches instead of listing them every scan"""
+        self.resource_cache = ResourceCache({
+            "pods": (self.v1_api.list_pod_for_all_namespaces, {"field_selector": _NOT_IN_SYSTEM_NAMESPACE}),
+            "services": (self.v1_api.list_service_for_all_namespaces, {"field_selector": _NOT_IN_SYSTEM_NAMESPACE}),
+            "namespaces": (self.v1_api.list_namespace, {"field_selector": _NOT_SYSTEM_NAMESPACE}),
+            "network_policies": (
+                self.networking_api.list_network_policy_for_all_namespaces,
+                {"field_selector": _NOT_IN_SYSTEM_NAMESPACE},
+            ),
+            "cluster_roles": (self.rbac_api.list_cluster_role, {"field_selector": _NOT_EXCLUDED_ROLE}),
+            "configmaps": (
+                self.v1_api.list_config_map_for_all_namespaces,
+                {"field_selector": _CONFIGMAP_FIELD_SELECTOR},
+            ),
+            "secrets": (self.v1_api.list_secret_for_all_namespaces, {}),
+        })
+        self.resource_cache.start()
+    
+    def stop_resource_cache(self) -> None:
+        """Stop the watches started by start_resource_cache"""
+        if self.resource_cache is not None:
+            self.resource_cache.stop()
+            self.resource_cache = None
+    
+    def _list(self, kind: str, list_func: Callable[..., Any], **kwargs: Any) -> List[Any]:
+        """Return the cached objects of a kind, or list them if the cache doesn't have them"""
+        if self.resource_cache is not None:
+            items = self.resource_cache.items(kind)
+            if items is not None:
+                return items
+        
+        return list(self._paginate(kind, list_func, **kwargs))
+    
+    def _paginate(self, kind: str, list_func: Callable[..., Any], **kwargs: Any) -> Iterator[Any]:
+        """List a kind page by page, yielding its objects"""
+        resource_version = self._resource_versions.get(kind)
+        if resource_version is not None:
+            # Anything at least as new as the last list will do, so the API server can
+            # answer from its watch cache instead of reading from etcd
+            kwargs.update(resource_version=resource_version, resource_version_match="NotOlderThan")
+        while True:
+            result = list_func(limit=LIST_PAGE_SIZE, _headers=ACCEPT_GZIP, **kwargs)
+            yield from result.items
+            token = result.metadata._continue
+            if not token:
+                break
+            # The token pins the rest of the list to the first page's snapshot
+            kwargs.pop("resource_version", None)
+            kwargs.pop("resource_version_match", None)
+            kwargs["_continue"] = token
+        self._resource_versions[kind] = result.metadata.resource_version
+    
+    def _list_pods(self, pods: Optional[List[Any]]) -> List[Any]:
+        """Return the pods fetched by scan(), or list the user pods with containers when a scan runs on its own"""
+        if pods is None:
+            pods = self._list(
+                "pods", self.v1_api.list_pod_for_all_namespaces, field_selector=_NOT_IN_SYSTEM_NAMESPACE
+            )
+            pods = [pod for pod in pods if pod.spec.containers]
+        return pods
+    
     # ========== SCAN 1: CONTAINER SECURITY ==========
-    def scan_container_security(self) -> dict:
+    def scan_container_security(self, pods: Optional[List[Any]] = None) -> dict:
         """Detect critical container security risks: privileged containers, host access, root users"""
         try:
-            pods = self.v1_api.list_pod_for_all_namespaces()
+            pods = self._list_pods(pods)
             findings = []
             
-            # System namespaces to exclude from security scans to avoid false positives
-            system_namespaces = ["kube-system", "kube-public", "kube-node-lease", "local-path-storage"]
-            
-            for pod in pods.items:
-                # Skip system namespaces
-                if pod.metadata.namespace in system_namespaces:
-                    continue
-
-                if not pod.spec.containers:
-                    continue
-                    
+            for pod in pods:
                 pod_issues = []
                 
                 for container in pod.spec.containers:
@@ -101,8 +279,7 @@ class ClusterScanner:
                     # Check for dangerous capabilities
                     if container.security_context and container.security_context.capabilities:
                         if container.security_context.capabilities.add:
-                            dangerous_caps = ["SYS_ADMIN", "NET_ADMIN", "SYS_MODULE", "DAC_READ_SEARCH"]
-                            added_caps = [cap for cap in container.security_context.capabilities.add if cap in dangerous_caps]
+                            added_caps = [cap for cap in container.security_context.capabilities.add if cap in _DANGEROUS_CAPS]
                             if added_caps:
                                 container_issues["vulnerabilities"].append({
                                     "type": "dangerous_capabilities",
@@ -165,23 +342,13 @@ class ClusterScanner:
             return {"success": False, "error": str(e), "count": 0, "findings": []}
     
     # ========== SCAN 2: RESOURCE LIMITS ==========
-    def scan_resource_limits(self) -> dict:
+    def scan_resource_limits(self, pods: Optional[List[Any]] = None) -> dict:
         """Detect containers without CPU/memory limits (DoS risk)"""
         try:
-            pods = self.v1_api.list_pod_for_all_namespaces()
+            pods = self._list_pods(pods)
             findings = []
             
-            # System namespaces to exclude
-            system_namespaces = ["kube-system", "kube-public", "kube-node-lease", "local-path-storage"]
-            
-            for pod in pods.items:
-                # Skip system namespaces
-                if pod.metadata.namespace in system_namespaces:
-                    continue
-
-                if not pod.spec.containers:
-                    continue
-                
+            for pod in pods:
                 containers_without_limits = []
                 
                 for container in pod.spec.containers:
@@ -225,20 +392,13 @@ class ClusterScanner:
             return {"success": False, "error": str(e), "count": 0, "findings": []}
     
     # ========== SCAN 3: SERVICEACCOUNT SECURITY ==========
-    def scan_serviceaccount_security(self) -> dict:
+    def scan_serviceaccount_security(self, pods: Optional[List[Any]] = None) -> dict:
         """Detect ServiceAccount token exposure and dangerous default SA permissions"""
         try:
-            pods = self.v1_api.list_pod_for_all_namespaces()
+            pods = self._list_pods(pods)
             findings = []
             
-            # System namespaces to exclude
-            system_namespaces = ["kube-system", "kube-public", "kube-node-lease", "local-path-storage"]
-            
-            for pod in pods.items:
-                # Skip system namespaces
-                if pod.metadata.namespace in system_namespaces:
-                    continue
-
+            for pod in pods:
                 issues = []
                 
                 # Check if ServiceAccount token is automounted
@@ -294,16 +454,11 @@ class ClusterScanner:
         try:
             findings = []
             
-            # System namespaces to exclude
-            system_namespaces = ["kube-system", "kube-public", "kube-node-lease", "local-path-storage"]
-            
             # Check for exposed services
-            services = self.v1_api.list_service_for_all_namespaces()
-            for svc in services.items:
-                # Skip system namespaces
-                if svc.metadata.namespace in system_namespaces:
-                    continue
-
+            services = self._list(
+                "services", self.v1_api.list_service_for_all_namespaces, field_selector=_NOT_IN_SYSTEM_NAMESPACE
+            )
+            for svc in services:
                 issues = []
                 
                 if svc.spec.type == "NodePort":
@@ -341,20 +496,18 @@ class ClusterScanner:
                     })
             
             # Check for namespaces without NetworkPolicies
-            namespaces = self.v1_api.list_namespace()
-            network_policies = self.networking_api.list_network_policy_for_all_namespaces()
+            namespaces = self._list("namespaces", self.v1_api.list_namespace, field_selector=_NOT_SYSTEM_NAMESPACE)
+            network_policies = self._list(
+                "network_policies",
+                self.networking_api.list_network_policy_for_all_namespaces,
+                field_selector=_NOT_IN_SYSTEM_NAMESPACE,
+            )
             
             # Build set of namespaces with policies
-            ns_with_policies = set()
-            for np in network_policies.items:
-                ns_with_policies.add(np.metadata.namespace)
+            ns_with_policies = {np.metadata.namespace for np in network_policies}
             
-            for ns in namespaces.items:
-                ns_name = ns.metadata.name
-                # Skip system namespaces
-                if ns_name in system_namespaces:
-                    continue
-                    
+            # Walked in list order rather than as a set difference, so findings keep a stable order
+            for ns_name in (ns.metadata.name for ns in namespaces):
                 if ns_name not in ns_with_policies:
                     findings.append({
                         "namespace": ns_name,
@@ -378,32 +531,16 @@ class ClusterScanner:
     def scan_rbac_wildcards(self) -> dict:
         """Detect dangerous RBAC permissions with wildcard (*) access"""
         try:
-            cluster_roles = self.rbac_api.list_cluster_role()
+            cluster_roles = self._list(
+                "cluster_roles", self.rbac_api.list_cluster_role, field_selector=_NOT_EXCLUDED_ROLE
+            )
             findings = []
             
-            # System/managed roles to exclude (they are expected to be powerful)
-            excluded_roles = {
-                "cluster-admin",
-                "admin",
-                "edit",
-                "view",
-                # Flux controllers need wide permissions to reconcile manifests
-                "crd-controller-flux-system",
-                "kustomize-controller-flux-system",
-                "helm-controller-flux-system",
-                "notification-controller-flux-system",
-                "source-controller-flux-system",
-                "flux-view-flux-system",
-                "flux-read-flux-system",
-                "flux-edit-flux-system",
-                "local-path-provisioner-role",
-            }
-            
-            for role in cluster_roles.items:
+            for role in cluster_roles:
                 role_name = role.metadata.name
                 
                 # Skip system roles
-                if role_name in excluded_roles or role_name.startswith("system:"):
+                if role_name in _EXCLUDED_ROLES or role_name.startswith("system:"):
                     continue
                     
                 dangerous_rules = []
@@ -428,9 +565,7 @@ class ClusterScanner:
                                 description = f"Can perform any action on: {', '.join(rule.resources or ['all'])}"
                             elif has_wildcard_resource:
                                 # Check if verbs are read-only
-                                read_only_verbs = {"get", "list", "watch"}
-                                rule_verbs = set(rule.verbs or [])
-                                if rule_verbs.issubset(read_only_verbs):
+                                if _READ_ONLY_VERBS.issuperset(rule.verbs or ()):
                                     severity = "medium"
                                     description = f"Can read all resources ({', '.join(rule.verbs)})"
                                 else:
@@ -464,35 +599,13 @@ class ClusterScanner:
             return {"success": False, "error": str(e), "count": 0, "findings": []}
     
     # ========== SCAN 6: IMAGE SECURITY ==========
-    def scan_image_security(self) -> dict:
+    def scan_image_security(self, pods: Optional[List[Any]] = None) -> dict:
         """Detect insecure image configurations: :latest tags, missing tags, untrusted registries"""
         try:
-            pods = self.v1_api.list_pod_for_all_namespaces()
+            pods = self._list_pods(pods)
             findings = []
             
-            # System namespaces to exclude
-            system_namespaces = ["kube-system", "kube-public", "kube-node-lease", "local-path-storage"]
-            
-            # Trusted registries
-            trusted_registries = [
-                "docker.io",
-                "gcr.io",
-                "ghcr.io",
-                "registry.k8s.io",
-                "k8s.gcr.io",
-                "quay.io",
-                "mcr.microsoft.com",
-                "public.ecr.aws",
-            ]
-            
-            for pod in pods.items:
-                # Skip system namespaces
-                if pod.metadata.namespace in system_namespaces:
-                    continue
-
-                if not pod.spec.containers:
-                    continue
-                
+            for pod in pods:
                 image_issues = []
                 
                 for container in pod.spec.containers:
@@ -512,16 +625,7 @@ class ClusterScanner:
                     if "." not in registry:  # Short form like "nginx" implies docker.io
                         registry = "docker.io"
                     
-                    is_trusted = False
-                    # Check exact match or suffix match for trusted registries
-                    if any(registry.endswith(trusted) or registry == trusted for trusted in trusted_registries):
-                        is_trusted = True
-                    
-                    # Check for AWS ECR pattern (*.dkr.ecr.*.amazonaws.com)
-                    if "dkr.ecr" in registry and "amazonaws.com" in registry:
-                        is_trusted = True
-                        
-                    if not is_trusted:
+                    if not _TRUSTED_REGISTRY_RE.search(registry):
                         issues.append({
                             "type": "untrusted_registry",
                             "severity": "medium", # Downgraded from high as it's likely a private registry
@@ -551,24 +655,23 @@ class ClusterScanner:
             return {"success": False, "error": str(e), "count": 0, "findings": []}
     
    # ========== SCAN 7: SECRETS & MISCONFIGURATIONS ==========
-    def scan_secrets(self) -> dict:
+    def scan_secrets(self, pods: Optional[List[Any]] = None) -> dict:
         """Detect exposed secrets, flags, and misconfigurations (CTF specific)"""
         try:
             findings = []
-            sensitive_keywords = ["password", "secret", "key", "token", "flag", "credential"]
             
             # 1. ConfigMaps (EASY)
-            configmaps = self.v1_api.list_config_map_for_all_namespaces()
-            for cm in configmaps.items:
-                if cm.metadata.namespace in ["kube-public", "kube-node-lease"]:
-                    continue
-                
+            configmaps = self._list(
+                "configmaps",
+                self.v1_api.list_config_map_for_all_namespaces,
+                field_selector=_CONFIGMAP_FIELD_SELECTOR,
+            )
+            for cm in configmaps:
                 if not cm.data:
                     continue
                     
                 for key, value in cm.data.items():
-                    if any(k in key.lower() for k in sensitive_keywords) or \
-                       any(k in str(value).lower() for k in sensitive_keywords):
+                    if _is_sensitive(key) or _is_sensitive(str(value)):
                         findings.append({
                             "type": "exposed_secret_configmap",
                             "severity": "high",
@@ -577,40 +680,33 @@ class ClusterScanner:
                         })
 
             # 2. Pod EnvVars (EASY)
-            pods = self.v1_api.list_pod_for_all_namespaces()
-            for pod in pods.items:
-                if pod.metadata.namespace in ["kube-system", "kube-public"]:
-                    continue
-                    
-                if not pod.spec.containers:
-                    continue
-                    
+            for pod in self._list_pods(pods):
+                resource = f"{pod.metadata.namespace}/pod/{pod.metadata.name}"
                 for container in pod.spec.containers:
                     if container.env:
                         for env in container.env:
-                            if env.value and any(k in env.name.lower() for k in sensitive_keywords):
+                            if env.value and _is_sensitive(env.name):
                                 findings.append({
                                     "type": "exposed_secret_env",
                                     "severity": "high",
                                     "description": f"Potential secret in EnvVar: {env.name}",
-                                    "resource": f"{pod.metadata.namespace}/pod/{pod.metadata.name}"
-                                })
-                    
-                    # 3. Volumes (EASY)
-                    if pod.spec.volumes:
-                        for vol in pod.spec.volumes:
-                            if (vol.secret or vol.config_map) and \
-                               any(k in vol.name.lower() for k in sensitive_keywords):
-                                findings.append({
-                                    "type": "suspicious_volume",
-                                    "severity": "medium",
-                                    "description": f"Suspicious volume mount: {vol.name}",
-                                    "resource": f"{pod.metadata.namespace}/pod/{pod.metadata.name}"
+                                    "resource": resource
                                 })
+                
+                # 3. Volumes (EASY), pod-level, so each one is reported once per pod
+                if pod.spec.volumes:
+                    for vol in pod.spec.volumes:
+                        if (vol.secret or vol.config_map) and _is_sensitive(vol.name):
+                            findings.append({
+                                "type": "suspicious_volume",
+                                "severity": "medium",
+                                "description": f"Suspicious volume mount: {vol.name}",
+                                "resource": resource
+                            })
 
             # 4. Secrets Analysis (EASY, MEDIUM, HARD)
-            secrets = self.v1_api.list_secret_for_all_namespaces()
-            for secret in secrets.items:
+            secrets = self._list("secrets", self.v1_api.list_secret_for_all_namespaces)
+            for secret in secrets:
                 # EASY: Secrets in default namespace
                 if secret.metadata.namespace == "default" and secret.type == "Opaque":
                     findings.append({
@@ -667,17 +763,39 @@ class ClusterScanner:
     
     def scan(self) -> dict:
         """Perform complete security scan"""
+        # Five scans look at pods, so list them once for all of them
+        try:
+            pods = self._list_pods(None)
+        except Exception:
+            pods = None  # Each pod scan lists again and reports the error itself
+        
+        scans = {
+            "container_security": lambda: self.scan_container_security(pods),
+            "resource_limits": lambda: self.scan_resource_limits(pods),
+            "serviceaccount_security": lambda: self.scan_serviceaccount_security(pods),
+            "network_exposure": self.scan_network_exposure,
+            "rbac_wildcards": self.scan_rbac_wildcards,
+            "image_security": lambda: self.scan_image_security(pods),
+            "secrets_misconfigs": lambda: self.scan_secrets(pods),
+        }
+        timestamp = _utc_now_z()
+        # The scans wait on the API server most of the time, so their requests overlap in threads
+        with ThreadPoolExecutor(max_workers=len(scans), thread_name_prefix="scan") as executor:
+            futures = {name: executor.submit(run) for name, run in scans.items()}
+        
+        results = {}
+        for name, future in futures.items():
+            result = future.result()
+            if result.get("success"):
+                self._last_scans[name] = result
+            elif name in self._last_scans:
+                # Keep the findings visible while the API server is unreachable
+                result = {**self._last_scans[name], "stale": True, "error": result.get("error")}
+            results[name] = result
+        
         scan_result = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "scans": {
-                "container_security": self.scan_container_security(),
-                "resource_limits": self.scan_resource_limits(),
-                "serviceaccount_security": self.scan_serviceaccount_security(),
-                "network_exposure": self.scan_network_exposure(),
-                "rbac_wildcards": self.scan_rbac_wildcards(),
-                "image_security": self.scan_image_security(),
-                "secrets_misconfigs": self.scan_secrets()
-            }
+            "timestamp": timestamp,
+            "scans": results
         }
         return scan_result
     
@@ -685,7 +803,6 @@ class ClusterScanner:
     def scan_topology(self, scan_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Scan cluster topology and build graph with vulnerability data"""
         try:
-            from .graph_builder import ClusterGraphBuilder
             builder = ClusterGraphBuilder(self, scan_data)
             graph = builder.build_graph()
             return graph
@@ -694,80 +811,96 @@ class ClusterScanner:
             import traceback
             traceback.print_exc()
             return {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                # The failed graph belongs to the scan it was built for
+                "timestamp": (scan_data or {}).get("timestamp") or _utc_now_z(),
                 "nodes": [],
                 "links": [],
                 "error": str(e)
             }
     
+    def _list_metrics(self, plural: str) -> Dict[Tuple[Optional[str], str], Dict[str, Any]]:
+        """
+        Return the metrics of all "pods" or "nodes", keyed by (namespace, name).
+
+        metrics-server is asked once for the whole cluster and the answer is
+        reused for METRICS_TTL seconds. A failed list counts as no metrics.
+        """
+        with self._metrics_cache_lock:
+            # Held while listing, so concurrent lookups wait for a single request
+            now = time.monotonic()
+            cached = self._metrics_cache.get(plural)
+            if cached is not None and now - cached[0] < METRICS_TTL:
+                return cached[1]
+            try:
+                result = self.metrics_api.list_cluster_custom_object(
+                    group="metrics.k8s.io",
+                    version="v1beta1",
+                    plural=plural
+                )
+                metrics = {
+                    (item["metadata"].get("namespace"), item["metadata"].get("name")): item
+                    for item in result.get("items", [])
+                }
+            except Exception:
+                metrics = {}
+            self._metrics_cache[plural] = (now, metrics)
+            return metrics
+    
     def get_pod_metrics(self, namespace: str, pod_name: str) -> Optional[Dict[str, Any]]:
         """Get metrics for a specific pod if metrics-server is available"""
         if not self.has_metrics or not self.metrics_api:
             return None
         
-        try:
-            metrics = self.metrics_api.get_namespaced_custom_object(
-                group="metrics.k8s.io",
-                version="v1beta1",
-                namespace=namespace,
-                plural="pods",
-                name=pod_name
-            )
-            
-            containers = []
-            if metrics.get("containers"):
-                for container in metrics["containers"]:
-                    containers.append({
-                        "name": container.get("name"),
-                        "usage": {
-                            "cpu": container.get("usage", {}).get("cpu"),
-                            "memory": container.get("usage", {}).get("memory")
-                        }
-                    })
-            
-            return {
-                "timestamp": metrics.get("timestamp"),
-                "window": metrics.get("window"),
-                "containers": containers
-            }
-        except Exception:
+        metrics = self._list_metrics("pods").get((namespace, pod_name))
+        if metrics is None:
             return None
+        
+        containers = []
+        if metrics.get("containers"):
+            for container in metrics["containers"]:
+                containers.append({
+                    "name": container.get("name"),
+                    "usage": {
+                        "cpu": container.get("usage", {}).get("cpu"),
+                        "memory": container.get("usage", {}).get("memory")
+                    }
+                })
+        
+        return {
+            "timestamp": metrics.get("timestamp"),
+            "window": metrics.get("window"),
+            "containers": containers
+        }
     
     def get_node_metrics(self, node_name: str) -> Optional[Dict[str, Any]]:
         """Get metrics for a specific node if metrics-server is available"""
         if not self.has_metrics or not self.metrics_api:
             return None
         
-        try:
-            metrics = self.metrics_api.get_cluster_custom_object(
-                group="metrics.k8s.io",
-                version="v1beta1",
-                plural="nodes",
-                name=node_name
-            )
-            
-            return {
-                "timestamp": metrics.get("timestamp"),
-                "window": metrics.get("window"),
-                "usage": {
-                    "cpu": metrics.get("usage", {}).get("cpu"),
-                    "memory": metrics.get("usage", {}).get("memory")
-                }
-            }
-        except Exception:
+        metrics = self._list_metrics("nodes").get((None, node_name))
+        if metrics is None:
             return None
+        
+        return {
+            "timestamp": metrics.get("timestamp"),
+            "window": metrics.get("window"),
+            "usage": {
+                "cpu": metrics.get("usage", {}).get("cpu"),
+                "memory": metrics.get("usage", {}).get("memory")
+            }
+        }
     
     def save_graph(self, graph_data: dict) -> bool:
         """Save graph result to JSON file"""
         try:
-            with open(self.graph_file, "w") as f:
-                json.dump(graph_data, f, indent=2)
+            # Compact, as the API embeds the file in its responses byte for byte
+            _write_atomic(self.graph_file, _dump_json(graph_data))
             print(f"✅ Graph saved to {self.graph_file} 🌐", flush=True)
             return True
         except Exception as e:
             print(f"❌ Error saving graph: {e} 🚨", flush=True)
             return False
-    
+
     def run_and_save(self) -> dict:
         """Run scan and save graph with integrated vulnerability data"""
         # Run vulnerability scans
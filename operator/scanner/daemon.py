@@ -1,6 +1,10 @@
 """Standalone cluster scanner daemon"""
 import asyncio
+import os
 import signal
+from typing import Optional
+import uvloop
+from watchfiles import awatch
 from scanner.cluster_scanner import ClusterScanner
 
 
@@ -11,20 +15,53 @@ class ScannerDaemon:
         self.scanner = ClusterScanner()
         self.interval = interval
         self.running = True
-        
-        # Setup signal handlers
-        signal.signal(signal.SIGTERM, self._signal_handler)
-        signal.signal(signal.SIGINT, self._signal_handler)
+        # Created in run(), on the loop that waits on it
+        self._stopped: Optional[asyncio.Event] = None
     
-    def _signal_handler(self, signum, _frame):
+    def _signal_handler(self, signum):
         """Handle shutdown signals gracefully"""
         print(f"\n🛑 Received signal {signum}, shutting down gracefully... 👋", flush=True)
         self.running = False
+        self._stopped.set()
+    
+    async def _sleep(self, seconds: float):
+        """Sleep for the given time, or until the daemon is stopped"""
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _wait_for_kubeconfig(self, kubeconfig_path: str):
+        """Return once the kubeconfig exists or the daemon is stopped"""
+        if os.path.exists(kubeconfig_path):
+            return
+        print(f"⏳ Waiting for kubeconfig at {kubeconfig_path}...", flush=True)
+        
+        kubeconfig_dir = os.path.dirname(kubeconfig_path)
+        if os.path.isdir(kubeconfig_dir):
+            # inotify wakes us when the file appears and stop_event on shutdown; the 1s timeouts
+            # let the exists() check cover a file created before the watch was set up
+            async for _ in awatch(
+                kubeconfig_dir, stop_event=self._stopped, rust_timeout=1000, yield_on_timeout=True
+            ):
+                if os.path.exists(kubeconfig_path):
+                    return
+            return
+        
+        # The directory isn't mounted yet, so there is nothing to watch
+        while not os.path.exists(kubeconfig_path) and self.running:
+            await self._sleep(5)
     
     async def run(self):
         """Main scanner loop"""
         kubeconfig_path = "/kubeconfig/config"
         
+        # Handlers registered on the loop run on it, so they can set the event directly
+        self._stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self._signal_handler, signum)
+        
         print("🔍 Scanner Daemon starting... 🚀", flush=True)
         print(f"📁 Output directory: {self.scanner.output_dir}", flush=True)
         print(f"⏱️  Scan interval: {self.interval} seconds", flush=True)
@@ -36,21 +73,20 @@ class ScannerDaemon:
         print("   5️⃣  Exposure (Ingress TLS and routes)", flush=True)
         print("   6️⃣  Images (container image scanning)", flush=True)
         
-        # Wait for kubeconfig
-        import os
-        while not os.path.exists(kubeconfig_path) and self.running:
-            print(f"⏳ Waiting for kubeconfig at {kubeconfig_path}...", flush=True)
-            await asyncio.sleep(5)
+        await self._wait_for_kubeconfig(kubeconfig_path)
         
         if not self.running:
             return
         
         print("✅ Kubeconfig found! Starting scans... 🎯", flush=True)
+        # Scans then read pods, services, ... from watches instead of listing them every interval
+        await asyncio.to_thread(self.scanner.start_resource_cache)
         
         while self.running:
             try:
                 print("\n📊 Running comprehensive cluster scan... 🔍", flush=True)
-                scan_data = self.scanner.run_and_save()
+                # In a thread, so shutdown signals are handled while a scan runs
+                scan_data = await asyncio.to_thread(self.scanner.run_and_save)
                 
                 # Print summary
                 print("📈 Scan Summary:", flush=True)
@@ -65,12 +101,10 @@ class ScannerDaemon:
                 import traceback
                 traceback.print_exc()
             
-            # Sleep with periodic checks for shutdown signal
-            for _ in range(self.interval):
-                if not self.running:
-                    break
-                await asyncio.sleep(1)
+            # One timer per interval; a shutdown signal ends the wait at once
+            await self._sleep(self.interval)
         
+        await asyncio.to_thread(self.scanner.stop_resource_cache)
         print("👋 Scanner daemon stopped gracefully 🏁", flush=True)
 
 
@@ -81,4 +115,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    uvloop.run(main())
@@ -7,20 +7,64 @@ with nodes (namespaces, nodes, pods, services) and links (contains, runs-on, exp
 
 import hashlib
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from kubernetes import client
 
-from .cluster_scanner import ClusterScanner
+if TYPE_CHECKING:  # cluster_scanner imports this module
+    from .cluster_scanner import ClusterScanner
 
 
 class ClusterGraphBuilder:
     """Builds a simplified graph representation of Kubernetes cluster topology."""
 
-    def __init__(self, scanner: ClusterScanner, scan_data: Optional[Dict[str, Any]] = None):
+    def __init__(self, scanner: "ClusterScanner", scan_data: Optional[Dict[str, Any]] = None):
         self.scanner = scanner
         self.scan_data = scan_data or {}
         self.nodes: List[Dict[str, Any]] = []
         self.links: List[Dict[str, Any]] = []
+        # Listed on first use and shared by every step of the build
+        self._pods: Optional[List[Any]] = None
+        self._services: Optional[List[Any]] = None
+        self._pods_by_namespace: Optional[Dict[str, List[Any]]] = None
+        self._services_by_namespace: Optional[Dict[str, List[Any]]] = None
+        self._pods_by_node: Optional[Dict[str, List[Any]]] = None
+
+    def _all_pods(self) -> List[Any]:
+        """List all pods of the cluster once per build."""
+        if self._pods is None:
+            self._pods = self.scanner.v1_api.list_pod_for_all_namespaces().items
+        return self._pods
+
+    def _all_services(self) -> List[Any]:
+        """List all services of the cluster once per build."""
+        if self._services is None:
+            self._services = self.scanner.v1_api.list_service_for_all_namespaces().items
+        return self._services
+
+    def _get_pods_by_namespace(self) -> Dict[str, List[Any]]:
+        """Group the pods by namespace."""
+        if self._pods_by_namespace is None:
+            self._pods_by_namespace = {}
+            for pod in self._all_pods():
+                self._pods_by_namespace.setdefault(pod.metadata.namespace, []).append(pod)
+        return self._pods_by_namespace
+
+    def _get_services_by_namespace(self) -> Dict[str, List[Any]]:
+        """Group the services by namespace."""
+        if self._services_by_namespace is None:
+            self._services_by_namespace = {}
+            for svc in self._all_services():
+                self._services_by_namespace.setdefault(svc.metadata.namespace, []).append(svc)
+        return self._services_by_namespace
+
+    def _get_pods_by_node(self) -> Dict[str, List[Any]]:
+        """Group the scheduled pods by node."""
+        if self._pods_by_node is None:
+            self._pods_by_node = {}
+            for pod in self._all_pods():
+                if pod.spec.node_name:
+                    self._pods_by_node.setdefault(pod.spec.node_name, []).append(pod)
+        return self._pods_by_node
 
     @staticmethod
     def _generate_vulnerability_id(vuln_type: str, namespace: str = "", 
@@ -110,11 +154,9 @@ class ClusterGraphBuilder:
                     "secrets": 0
                 }
                 try:
-                    pods = self.scanner.v1_api.list_namespaced_pod(ns.metadata.name)
-                    resource_count["pods"] = len(pods.items)
+                    resource_count["pods"] = len(self._get_pods_by_namespace().get(ns.metadata.name, []))
                     
-                    services = self.scanner.v1_api.list_namespaced_service(ns.metadata.name)
-                    resource_count["services"] = len(services.items)
+                    resource_count["services"] = len(self._get_services_by_namespace().get(ns.metadata.name, []))
                     
                     deployments = self.scanner.apps_api.list_namespaced_deployment(ns.metadata.name)
                     resource_count["deployments"] = len(deployments.items)
@@ -225,12 +267,10 @@ class ClusterGraphBuilder:
                 
                 # Count resources allocated by pods on this node
                 try:
-                    pods_on_node = self.scanner.v1_api.list_pod_for_all_namespaces(
-                        field_selector=f"spec.nodeName={node.metadata.name}"
-                    )
-                    allocated_resources["pods"] = len(pods_on_node.items)
+                    pods_on_node = self._get_pods_by_node().get(node.metadata.name, [])
+                    allocated_resources["pods"] = len(pods_on_node)
                     
-                    for pod in pods_on_node.items:
+                    for pod in pods_on_node:
                         if pod.spec.containers:
                             for container in pod.spec.containers:
                                 if container.resources:
@@ -304,8 +344,7 @@ class ClusterGraphBuilder:
     def add_pod_nodes(self) -> None:
         """Add pod nodes to the graph with comprehensive kubectl describe equivalent data."""
         try:
-            pods = self.scanner.v1_api.list_pod_for_all_namespaces()
-            for pod in pods.items:
+            for pod in self._all_pods():
                 pod_status = pod.status.phase.lower() if pod.status.phase else "unknown"
                 
                 # Extract container information with resources
@@ -514,91 +553,91 @@ class ClusterGraphBuilder:
     def add_service_nodes(self) -> None:
         """Add service nodes to the graph."""
         try:
-            services = self.scanner.v1_api.list_service_for_all_namespaces()
-            for svc in services.items:
-                # Extract ports
-                ports = []
-                if svc.spec.ports:
-                    for port in svc.spec.ports:
-                        ports.append({
-                            "name": port.name,
-                            "protocol": port.protocol,
-                            "port": port.port,
-                            "target_port": str(port.target_port) if port.target_port else None,
-                            "node_port": port.node_port
-                        })
-                
-                # Extract selectors
-                selectors = svc.spec.selector if svc.spec.selector else {}
-                
-                # Get endpoints to see how many pods are backing this service
-                endpoints_info = {
-                    "ready": 0,
-                    "not_ready": 0,
-                    "addresses": []
-                }
-                try:
-                    endpoints = self.scanner.v1_api.read_namespaced_endpoints(
-                        name=svc.metadata.name,
-                        namespace=svc.metadata.namespace
-                    )
-                    if endpoints.subsets:
-                        for subset in endpoints.subsets:
-                            if subset.addresses:
-                                endpoints_info["ready"] += len(subset.addresses)
-                                for addr in subset.addresses:
-                                    endpoints_info["addresses"].append({
-                                        "ip": addr.ip,
-                                        "hostname": addr.hostname,
-                                        "node_name": addr.node_name,
-                                        "target_ref": {
-                                            "kind": addr.target_ref.kind,
-                                            "name": addr.target_ref.name
-                                        } if addr.target_ref else None
-                                    })
-                            if subset.not_ready_addresses:
-                                endpoints_info["not_ready"] += len(subset.not_ready_addresses)
-                except Exception:
-                    # Endpoints might not exist for some services
-                    pass
-                
-                # Extract labels and annotations
-                labels = dict(svc.metadata.labels) if svc.metadata.labels else {}
-                annotations = dict(svc.metadata.annotations) if svc.metadata.annotations else {}
-                
-                # Get load balancer status
-                load_balancer_status = {}
-                if svc.status and svc.status.load_balancer:
-                    if svc.status.load_balancer.ingress:
-                        load_balancer_status = {
-                            "ingress": [
-                                {
-                                    "ip": ing.ip,
-                                    "hostname": ing.hostname
-                                } for ing in svc.status.load_balancer.ingress
-                            ]
-                        }
+            for ns, services in self._get_services_by_namespace().items():
+                for svc in services:
+                    # Extract ports
+                    ports = []
+                    if svc.spec.ports:
+                        for port in svc.spec.ports:
+                            ports.append({
+                                "name": port.name,
+                                "protocol": port.protocol,
+                                "port": port.port,
+                                "target_port": str(port.target_port) if port.target_port else None,
+                                "node_port": port.node_port
+                            })
+                
+                    # Extract selectors
+                    selectors = svc.spec.selector if svc.spec.selector else {}
+                
+                    # Get endpoints to see how many pods are backing this service
+                    endpoints_info = {
+                        "ready": 0,
+                        "not_ready": 0,
+                        "addresses": []
+                    }
+                    try:
+                        endpoints = self.scanner.v1_api.read_namespaced_endpoints(
+                            name=svc.metadata.name,
+                            namespace=ns
+                        )
+                        if endpoints.subsets:
+                            for subset in endpoints.subsets:
+                                if subset.addresses:
+                                    endpoints_info["ready"] += len(subset.addresses)
+                                    for addr in subset.addresses:
+                                        endpoints_info["addresses"].append({
+                                            "ip": addr.ip,
+                                            "hostname": addr.hostname,
+                                            "node_name": addr.node_name,
+                                            "target_ref": {
+                                                "kind": addr.target_ref.kind,
+                                                "name": addr.target_ref.name
+                                            } if addr.target_ref else None
+                                        })
+                                if subset.not_ready_addresses:
+                                    endpoints_info["not_ready"] += len(subset.not_ready_addresses)
+                    except Exception:
+                        # Endpoints might not exist for some services
+                        pass
+                
+                    # Extract labels and annotations
+                    labels = dict(svc.metadata.labels) if svc.metadata.labels else {}
+                    annotations = dict(svc.metadata.annotations) if svc.metadata.annotations else {}
+                
+                    # Get load balancer status
+                    load_balancer_status = {}
+                    if svc.status and svc.status.load_balancer:
+                        if svc.status.load_balancer.ingress:
+                            load_balancer_status = {
+                                "ingress": [
+                                    {
+                                        "ip": ing.ip,
+                                        "hostname": ing.hostname
+                                    } for ing in svc.status.load_balancer.ingress
+                                ]
+                            }
                 
-                service_node = {
-                    "id": f"svc-{svc.metadata.namespace}-{svc.metadata.name}",
-                    "label": svc.metadata.name,
-                    "type": "service",
-                    "namespace": svc.metadata.namespace,
-                    "status": svc.spec.type,
-                    "cluster_ip": svc.spec.cluster_ip,
-                    "external_ips": svc.spec.external_i_ps if svc.spec.external_i_ps else [],
-                    "load_balancer_ip": svc.spec.load_balancer_ip,
-                    "session_affinity": svc.spec.session_affinity,
-                    "ports": ports,
-                    "selectors": selectors,
-                    "endpoints": endpoints_info,
-                    "vulnerabilities": self._get_service_vulnerabilities(svc),
-                    # Additional kubectl describe equivalent fields
-                    "labels": labels,
-                    "annotations": annotations,
-                    "load_balancer_status": load_balancer_status,
-                }
-                self.nodes.append(service_node)
+                    service_node = {
+                        "id": f"svc-{ns}-{svc.metadata.name}",
+                        "label": svc.metadata.name,
+                        "type": "service",
+                        "namespace": ns,
+                        "status": svc.spec.type,
+                        "cluster_ip": svc.spec.cluster_ip,
+                        "external_ips": svc.spec.external_i_ps if svc.spec.external_i_ps else [],
+                        "load_balancer_ip": svc.spec.load_balancer_ip,
+                        "session_affinity": svc.spec.session_affinity,
+                        "ports": ports,
+                        "selectors": selectors,
+                        "endpoints": endpoints_info,
+                        "vulnerabilities": self._get_service_vulnerabilities(svc),
+                        # Additional kubectl describe equivalent fields
+                        "labels": labels,
+                        "annotations": annotations,
+                        "load_balancer_status": load_balancer_status,
+                    }
+                    self.nodes.append(service_node)
         except Exception as e:
             print(f"❌ Error adding service nodes: {e}")
 
@@ -607,8 +646,7 @@ class ClusterGraphBuilder:
         try:
             print("🔗 Adding namespace contains links...", flush=True)
             # Namespace contains pods
-            pods = self.scanner.v1_api.list_pod_for_all_namespaces()
-            for pod in pods.items:
+            for pod in self._all_pods():
                 ns = pod.metadata.namespace
                 self.links.append({
                     "source": f"ns-{ns}",
@@ -617,14 +655,13 @@ class ClusterGraphBuilder:
                 })
 
             # Namespace contains services
-            services = self.scanner.v1_api.list_service_for_all_namespaces()
-            for svc in services.items:
-                ns = svc.metadata.namespace
-                self.links.append({
-                    "source": f"ns-{ns}",
-                    "target": f"svc-{ns}-{svc.metadata.name}",
-                    "type": "contains",
-                })
+            for ns, services in self._get_services_by_namespace().items():
+                for svc in services:
+                    self.links.append({
+                        "source": f"ns-{ns}",
+                        "target": f"svc-{ns}-{svc.metadata.name}",
+                        "type": "contains",
+                    })
             print("✅ Added namespace contains links", flush=True)
         except Exception as e:
             print(f"❌ Error adding namespace contains links: {e}", flush=True)
@@ -632,8 +669,7 @@ class ClusterGraphBuilder:
     def add_pod_to_node_links(self) -> None:
         """Add links showing pods running on nodes."""
         try:
-            pods = self.scanner.v1_api.list_pod_for_all_namespaces()
-            for pod in pods.items:
+            for pod in self._all_pods():
                 if pod.spec.node_name:
                     ns = pod.metadata.namespace
                     self.links.append({
@@ -647,21 +683,20 @@ class ClusterGraphBuilder:
     def add_service_to_pod_links(self) -> None:
         """Add links showing services exposing pods."""
         try:
-            services = self.scanner.v1_api.list_service_for_all_namespaces()
-            for svc in services.items:
-                if not svc.spec.selector:
-                    continue
+            pods_by_namespace = self._get_pods_by_namespace()
+            for ns, services in self._get_services_by_namespace().items():
+                pods = pods_by_namespace.get(ns, [])
+                for svc in services:
+                    if not svc.spec.selector:
+                        continue
 
-                ns = svc.metadata.namespace
-                pods = self.scanner.v1_api.list_namespaced_pod(ns)
-
-                for pod in pods.items:
-                    if self._matches_selector(pod.metadata.labels or {}, svc.spec.selector):
-                        self.links.append({
-                            "source": f"svc-{ns}-{svc.metadata.name}",
-                            "target": f"pod-{ns}-{pod.metadata.name}",
-                            "type": "exposes",
-                        })
+                    for pod in pods:
+                        if self._matches_selector(pod.metadata.labels or {}, svc.spec.selector):
+                            self.links.append({
+                                "source": f"svc-{ns}-{svc.metadata.name}",
+                                "target": f"pod-{ns}-{pod.metadata.name}",
+                                "type": "exposes",
+                            })
         except Exception as e:
             print(f"❌ Error adding service to pod links: {e}")
 
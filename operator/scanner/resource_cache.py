@@ -0,0 +1,157 @@
+"""Watch-backed cache of the cluster objects the scans read"""
+import functools
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from kubernetes import watch
+
+# Lets the API server gzip large list responses; urllib3 decodes them when the body is read.
+# Only for lists: the watch stream reads raw bytes and would get compressed chunks
+ACCEPT_GZIP = {"Accept-Encoding": "gzip"}
+
+
+class _Informer:
+    """Keeps the result of one list call up to date through a watch"""
+
+    def __init__(self, kind: str, list_func: Callable[..., Any], list_kwargs: Dict[str, Any], relist_period: int):
+        self.kind = kind
+        self.list_func = list_func
+        self.list_kwargs = list_kwargs
+        self.relist_period = relist_period
+        self.synced = threading.Event()
+        self._objects: Dict[Tuple[Optional[str], str], Any] = {}
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._watch: Optional[watch.Watch] = None
+        self._response: Any = None
+
+    @staticmethod
+    def _key(obj: Any) -> Tuple[Optional[str], str]:
+        return obj.metadata.namespace, obj.metadata.name
+
+    def items(self) -> List[Any]:
+        with self._lock:
+            return list(self._objects.values())
+
+    def run(self) -> None:
+        """List, then apply watch events until the next relist is due; repeat"""
+        while not self._stopped.is_set():
+            try:
+                # A relist every relist_period (or after a failed watch) recovers missed events
+                resource_version = self._relist()
+                self._apply_events(resource_version)
+            except Exception as e:
+                if self._stopped.is_set():
+                    break  # stop() cut the connection
+                print(f"⚠️  Watch on {self.kind} failed, relisting: {e}", flush=True)
+                self._stopped.wait(5)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+        self._interrupt()
+
+    def _interrupt(self) -> None:
+        """Shut down the watch connection, so a read blocked on the next event returns"""
+        # Watch.stop() is only checked between events and closing the response doesn't wake a
+        # blocked read, shutting down its socket does
+        connection = getattr(self._response, "connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _relist(self) -> str:
+        # Like client-go's reflector, resource version "0" lets the API server answer from its
+        # watch cache instead of a quorum read from etcd; the watch catches up from there
+        result = self.list_func(resource_version="0", _headers=ACCEPT_GZIP, **self.list_kwargs)
+        objects = {self._key(obj): obj for obj in result.items}
+        with self._lock:
+            self._objects = objects
+        self.synced.set()
+        return result.metadata.resource_version
+
+    def _apply_events(self, resource_version: str) -> None:
+        relist_at = time.monotonic() + self.relist_period
+        self._watch = watch.Watch()
+
+        # Keeps the streaming response around for stop(); wraps() keeps the docstring the
+        # watch reads the object type from
+        @functools.wraps(self.list_func)
+        def open_watch(**kwargs: Any) -> Any:
+            self._response = self.list_func(**kwargs)
+            if self._stopped.is_set():
+                self._interrupt()  # stop() ran while the watch was being opened
+            return self._response
+
+        # Without timeout_seconds the stream resumes from the last resource version it saw when the
+        # server closes the watch, instead of us listing everything again. Bookmarks keep that
+        # version current on quiet kinds; a version too old to resume from raises a 410 and the
+        # read timeout catches dead connections, both end in a relist
+        for event in self._watch.stream(
+            open_watch,
+            resource_version=resource_version,
+            allow_watch_bookmarks=True,
+            _request_timeout=(10, self.relist_period),
+            **self.list_kwargs,
+        ):
+            if self._stopped.is_set():
+                break
+            event_type = event["type"]
+            if event_type in ("ADDED", "MODIFIED", "DELETED"):
+                obj = event["object"]
+                with self._lock:
+                    if event_type == "DELETED":
+                        self._objects.pop(self._key(obj), None)
+                    else:
+                        self._objects[self._key(obj)] = obj
+            if time.monotonic() >= relist_at:
+                break
+        self._watch.stop()
+        self._response = None
+
+
+class ResourceCache:
+    """
+    Lists each kind of object once and follows changes through watches.
+
+    Every source is a `list_*` function of the Kubernetes client with the
+    keyword arguments (selectors) to list and watch with, and gets its own
+    daemon thread. Reads return the cached objects without calling the API.
+    """
+
+    def __init__(self, sources: Dict[str, Tuple[Callable[..., Any], Dict[str, Any]]], relist_period: int = 600):
+        self._informers = {
+            kind: _Informer(kind, list_func, list_kwargs, relist_period)
+            for kind, (list_func, list_kwargs) in sources.items()
+        }
+        self._threads: List[threading.Thread] = []
+
+    def start(self, timeout: float = 30.0) -> None:
+        """Start the watches and wait up to `timeout` seconds for the initial lists"""
+        for kind, informer in self._informers.items():
+            thread = threading.Thread(target=informer.run, name=f"watch-{kind}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for informer in self._informers.values():
+            informer.synced.wait(timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the watches and wait up to `timeout` seconds for their threads to end"""
+        for informer in self._informers.values():
+            informer.stop()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+    def items(self, kind: str) -> Optional[List[Any]]:
+        """Return the cached objects of a kind, or None if it was never listed successfully"""
+        informer = self._informers.get(kind)
+        if informer is None or not informer.synced.is_set():
+            return None
+        return informer.items()
@@ -0,0 +1,193 @@
+"""
+Test suite for the autofix repository cache.
+"""
+
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+
+def _run_git(repo_dir: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo_dir,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo_cache(tmp_path):
+    """Point the repository cache at a scratch directory cloning a local remote."""
+    import autofix
+
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    _run_git(remote, "init", "-q", "-b", "main")
+    (remote / "deployment.yaml").write_text("kind: Deployment\n")
+    _run_git(remote, "add", ".")
+    _run_git(remote, "commit", "-q", "-m", "Initial commit")
+
+    scratch = tmp_path / "scratch"
+    with patch.object(autofix, "REPO_URL", f"file://{remote}"), \
+         patch.object(autofix, "REPO_BRANCH", "main"), \
+         patch.object(autofix, "SCRATCH_DIR", scratch), \
+         patch.object(autofix, "REPO_CACHE_DIR", scratch / "cache"), \
+         patch.object(autofix, "REPO_CACHE_LOCK_FILE", scratch / "cache.lock"), \
+         patch.object(autofix, "REPO_REFRESH_INTERVAL_SECONDS", 0), \
+         patch.object(autofix, "_idle_worktrees", []):
+        yield remote
+
+
+class TestRepoCache:
+    """Tests for the shared repository cache"""
+
+    def test_failed_refresh_keeps_cache(self, repo_cache):
+        """Test that an unreachable remote leaves the cache and its worktrees intact"""
+        import autofix
+
+        in_flight = autofix.create_worktree()
+        repo_cache.rename(repo_cache.with_name("gone"))
+
+        worktree = autofix.create_worktree()
+
+        assert (autofix.REPO_CACHE_DIR / ".git").is_dir()
+        assert (worktree / "deployment.yaml").exists()
+        assert _run_git(in_flight, "status", "--porcelain") == ""
+
+    def test_corrupt_cache_is_kept_while_worktrees_are_registered(self, repo_cache):
+        """Test that a corrupt cache is only re-cloned once no worktree links into it"""
+        import autofix
+
+        in_flight = autofix.create_worktree()
+        (autofix.REPO_CACHE_DIR / ".git" / "HEAD").write_text("0" * 40 + "\n")
+        offline = repo_cache.with_name("offline")
+        repo_cache.rename(offline)
+
+        with pytest.raises(RuntimeError):
+            autofix.create_worktree()
+        assert (autofix.REPO_CACHE_DIR / ".git").is_dir()
+
+        offline.rename(repo_cache)
+        autofix.cleanup_repo(in_flight)
+        worktree = autofix.create_worktree()
+
+        assert (worktree / "deployment.yaml").exists()
+
+    def test_pool_is_bounded_across_processes(self, repo_cache):
+        """Test that finished worktrees are only pooled while the cache has few worktrees in total"""
+        import autofix
+
+        first = autofix.create_worktree()
+        second = autofix.create_worktree()
+        # A worktree of another worker process, not in this process's pool
+        other = autofix.SCRATCH_DIR / "other-process"
+        _run_git(autofix.REPO_CACHE_DIR, "worktree", "add", "-q", "--detach", str(other))
+
+        with patch.object(autofix, "WORKTREE_POOL_SIZE", 2):
+            autofix.remove_worktree(first)
+            autofix.remove_worktree(second)
+
+        assert autofix._idle_worktrees == [second]
+        assert not first.exists()
+        assert autofix._worktree_count() == 2
+
+    def test_worktree_on_disk_when_scratch_is_full(self, repo_cache, tmp_path):
+        """Test that new worktrees go to disk when the scratch directory runs low"""
+        import autofix
+
+        disk = tmp_path / "disk"
+        with patch.object(autofix, "DISK_SCRATCH_DIR", disk), \
+             patch.object(autofix, "SCRATCH_MIN_FREE_BYTES", 0):
+            in_scratch = autofix.create_worktree()
+        with patch.object(autofix, "DISK_SCRATCH_DIR", disk), \
+             patch.object(autofix, "SCRATCH_MIN_FREE_BYTES", 1 << 62):
+            on_disk = autofix.create_worktree()
+
+        assert in_scratch.parent == autofix.SCRATCH_DIR
+        assert on_disk.parent == disk
+        assert (on_disk / "deployment.yaml").exists()
+
+
+class TestCommit:
+    """Tests for committing fixes from worktrees of the shared cache"""
+
+    def test_parallel_commits(self, repo_cache):
+        """Test that fixes committing at the same time don't fight over the shared git config"""
+        from concurrent.futures import ThreadPoolExecutor
+        import autofix
+        from autofix import git_operations
+
+        worktrees = [autofix.create_worktree() for _ in range(8)]
+        for index, worktree in enumerate(worktrees):
+            (worktree / "deployment.yaml").write_text(f"kind: Deployment\nreplicas: {index}\n")
+
+        with patch.object(git_operations, "_push_url", return_value=f"file://{repo_cache}"), \
+             ThreadPoolExecutor(max_workers=len(worktrees)) as executor:
+            list(executor.map(
+                lambda item: git_operations.commit_and_push_changes(item[1], f"autofix/test-{item[0]}", "Fix"),
+                enumerate(worktrees),
+            ))
+
+        branches = _run_git(repo_cache, "branch", "--list", "autofix/*").split()
+        assert len(branches) == len(worktrees)
+        assert _run_git(repo_cache, "log", "-1", "--format=%an <%ae>", "autofix/test-0") == (
+            "Carakube Bot <bot@carakube.local>"
+        )
+        assert "user" not in (autofix.REPO_CACHE_DIR / ".git" / "config").read_text()
+
+
+class TestContextSelection:
+    """Tests for ranking and selecting the files sent to Gemini"""
+
+    FILES = [
+        ("README.md", "Flux repository\n"),
+        ("apps/postgres/statefulset.yaml", "kind: StatefulSet\nmetadata:\n  name: postgres\n"),
+        ("apps/web/kustomization.yaml", "kind: Kustomization\nresources: [deployment.yaml]\n"),
+        ("apps/web/deployment.yaml", "kind: Deployment\nmetadata:\n  name: web\n"),
+    ]
+    NODE = {"label": "web-7d9f8-abcde", "type": "pod", "namespace": "default"}
+
+    def test_select_context_files_follows_rank(self):
+        """Test that the selection keeps the ranked files naming the resource, then their siblings"""
+        import autofix
+
+        vulnerability = {"type": "privileged_container", "container": "nginx"}
+        ranked = autofix.rank_files_for_vulnerabilities(self.FILES, [vulnerability], self.NODE)
+        selected = autofix.select_context_files(self.FILES, vulnerability, self.NODE)
+
+        assert [path for path, _ in ranked[:3]] == [
+            "apps/web/deployment.yaml", "apps/web/kustomization.yaml", "apps/postgres/statefulset.yaml",
+        ]
+        assert [path for path, _ in selected] == ["apps/web/deployment.yaml", "apps/web/kustomization.yaml"]
+
+    def test_select_context_files_without_match(self):
+        """Test that all files are returned by rank when none names the resource"""
+        import autofix
+
+        node_info = {"label": "api", "type": "service", "namespace": "default"}
+        selected = autofix.select_context_files(self.FILES, {"type": "host_network"}, node_info)
+
+        assert selected == autofix.rank_files_for_vulnerabilities(self.FILES, [{"type": "host_network"}], node_info)
+        assert selected[-1][0] == "README.md"
+
+    def test_batch_ranks_by_best_score(self):
+        """Test that a shared context ranks every vulnerability's files, not only the first one's"""
+        import autofix
+
+        node_info = {"label": "cluster", "type": "namespace", "namespace": "default"}
+        vulnerabilities = [
+            {"type": "privileged_container", "container": "web"},
+            {"type": "privileged_container", "container": "postgres"},
+        ]
+
+        ranked = autofix.rank_files_for_vulnerabilities(self.FILES, vulnerabilities, node_info)
+
+        assert [path for path, _ in ranked[:3]] == [
+            "apps/postgres/statefulset.yaml", "apps/web/deployment.yaml", "apps/web/kustomization.yaml",
+        ]
+        # Ranked for the first vulnerability alone, the second one's manifest is just another manifest
+        assert autofix.rank_files_for_vulnerabilities(self.FILES, vulnerabilities[:1], node_info)[2][0] == "apps/postgres/statefulset.yaml"
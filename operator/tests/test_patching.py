@@ -0,0 +1,142 @@
+"""
+Test suite for the in-process unified diff applier.
+"""
+
+from autofix.patching import apply_unified_diff
+
+DEPLOYMENT = """\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: web
+spec:
+  template:
+    spec:
+      containers:
+        - name: web
+          image: nginx:latest
+          securityContext:
+            privileged: true
+"""
+
+PRIVILEGED_PATCH = """\
+--- a/deployment.yaml
++++ b/deployment.yaml
+@@ -10,3 +10,3 @@
+           image: nginx:latest
+           securityContext:
+-            privileged: true
++            privileged: false
+"""
+
+
+class TestApplyUnifiedDiff:
+    """Tests for apply_unified_diff"""
+
+    def test_clean_apply(self, tmp_path):
+        """Test that a matching patch is written to the file"""
+        (tmp_path / "deployment.yaml").write_text(DEPLOYMENT)
+
+        assert apply_unified_diff(tmp_path, PRIVILEGED_PATCH) == True
+        assert (tmp_path / "deployment.yaml").read_text() == DEPLOYMENT.replace(
+            "privileged: true", "privileged: false"
+        )
+
+    def test_dry_run_leaves_file_untouched(self, tmp_path):
+        """Test that a dry run only checks the patch"""
+        (tmp_path / "deployment.yaml").write_text(DEPLOYMENT)
+
+        assert apply_unified_diff(tmp_path, PRIVILEGED_PATCH, dry_run=True) == True
+        assert (tmp_path / "deployment.yaml").read_text() == DEPLOYMENT
+
+    def test_hunk_at_shifted_offset(self, tmp_path):
+        """Test that a hunk is placed where its context matches, not where its header says"""
+        shifted = "# Managed by Carakube\n---\n" + DEPLOYMENT
+        (tmp_path / "deployment.yaml").write_text(shifted)
+
+        assert apply_unified_diff(tmp_path, PRIVILEGED_PATCH) == True
+        assert (tmp_path / "deployment.yaml").read_text() == shifted.replace(
+            "privileged: true", "privileged: false"
+        )
+
+    def test_header_like_body_lines(self, tmp_path):
+        """Test that removed `-- ` and added `++ ` lines are read as hunk body, not headers"""
+        (tmp_path / "query.sql").write_text("-- old comment\nSELECT 1;\n")
+        patch_content = """\
+--- a/query.sql
++++ b/query.sql
+@@ -1,2 +1,2 @@
+--- old comment
++++ new comment
+ SELECT 1;
+"""
+
+        assert apply_unified_diff(tmp_path, patch_content) == True
+        assert (tmp_path / "query.sql").read_text() == "++ new comment\nSELECT 1;\n"
+
+    def test_refuses_wrong_counts(self, tmp_path):
+        """Test that a hunk whose counts don't match its body is left to git apply"""
+        (tmp_path / "deployment.yaml").write_text(DEPLOYMENT)
+
+        assert apply_unified_diff(tmp_path, PRIVILEGED_PATCH.replace("-10,3 +10,3", "-10,2 +10,2")) == False
+        assert (tmp_path / "deployment.yaml").read_text() == DEPLOYMENT
+
+    def test_refuses_context_mismatch(self, tmp_path):
+        """Test that a patch whose context doesn't match is refused without writing"""
+        (tmp_path / "deployment.yaml").write_text(DEPLOYMENT.replace("nginx:latest", "nginx:1.27"))
+
+        assert apply_unified_diff(tmp_path, PRIVILEGED_PATCH) == False
+        assert "privileged: true" in (tmp_path / "deployment.yaml").read_text()
+
+    def test_refuses_missing_file(self, tmp_path):
+        """Test that a patch for a file that doesn't exist is refused"""
+        assert apply_unified_diff(tmp_path, PRIVILEGED_PATCH) == False
+        assert not (tmp_path / "deployment.yaml").exists()
+
+    def test_refuses_path_outside_repo(self, tmp_path):
+        """Test that paths escaping the repository are refused"""
+        repo_dir = tmp_path / "repo"
+        repo_dir.mkdir()
+        (tmp_path / "deployment.yaml").write_text(DEPLOYMENT)
+
+        for path in ("../deployment.yaml", str(tmp_path / "deployment.yaml")):
+            patch_content = PRIVILEGED_PATCH.replace("a/deployment.yaml", path).replace("b/deployment.yaml", path)
+            assert apply_unified_diff(repo_dir, patch_content) == False
+        assert (tmp_path / "deployment.yaml").read_text() == DEPLOYMENT
+
+    def test_new_file(self, tmp_path):
+        """Test that a patch from /dev/null creates the file and its directories"""
+        patch_content = """\
+--- /dev/null
++++ b/policies/deny-all.yaml
+@@ -0,0 +1,2 @@
++apiVersion: networking.k8s.io/v1
++kind: NetworkPolicy
+"""
+
+        assert apply_unified_diff(tmp_path, patch_content) == True
+        assert (tmp_path / "policies" / "deny-all.yaml").read_text() == (
+            "apiVersion: networking.k8s.io/v1\nkind: NetworkPolicy\n"
+        )
+        # An existing file is never overwritten
+        assert apply_unified_diff(tmp_path, patch_content) == False
+
+    def test_deleted_file(self, tmp_path):
+        """Test that a patch to /dev/null removes the file only if it matches completely"""
+        (tmp_path / "old.yaml").write_text("kind: Pod\nmetadata: {}\n")
+        patch_content = """\
+--- a/old.yaml
++++ /dev/null
+@@ -1,2 +0,0 @@
+-kind: Pod
+-metadata: {}
+"""
+
+        assert apply_unified_diff(tmp_path, patch_content, dry_run=True) == True
+        assert (tmp_path / "old.yaml").exists()
+        assert apply_unified_diff(tmp_path, patch_content) == True
+        assert not (tmp_path / "old.yaml").exists()
+
+        (tmp_path / "old.yaml").write_text("kind: Pod\nmetadata: {}\nspec: {}\n")
+        assert apply_unified_diff(tmp_path, patch_content) == False
+        assert (tmp_path / "old.yaml").exists()
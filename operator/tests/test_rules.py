@@ -0,0 +1,164 @@
+"""
+Test suite for the rule-based autofixes.
+"""
+
+from autofix import rules
+
+DEPLOYMENT = """\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: web
+spec:
+  template:
+    spec:
+      hostNetwork: true
+      containers:
+        - name: web
+          image: nginx:1.27
+          securityContext:
+            privileged: true
+        - name: sidecar
+          image: busybox:1.36
+"""
+
+POD = """\
+apiVersion: v1
+kind: Pod
+metadata:
+  name: debug
+spec:
+  containers:
+  - name: shell
+    image: busybox:1.36
+"""
+
+FILES = [("k8s/web.yaml", DEPLOYMENT), ("k8s/debug.yaml", POD), ("README.md", "web debug\n")]
+
+# Pod of the Deployment above, with the generated ReplicaSet and pod suffixes
+DEPLOYMENT_POD = {"id": "pod-default-web-7d9f8-abcde", "label": "web-7d9f8-abcde", "type": "pod"}
+POD_NODE = {"id": "pod-default-debug", "label": "debug", "type": "pod"}
+
+
+class TestRules:
+    """Tests for rules.try_fix"""
+
+    def test_privileged_container(self):
+        """Test that privileged mode is switched off for the named container"""
+        vulnerability = {"type": "privileged_container", "container": "web"}
+
+        assert rules.try_fix(vulnerability, DEPLOYMENT_POD, FILES) == """\
+--- a/k8s/web.yaml
++++ b/k8s/web.yaml
+@@ -10,6 +10,6 @@
+         - name: web
+           image: nginx:1.27
+           securityContext:
+-            privileged: true
++            privileged: false
+         - name: sidecar
+           image: busybox:1.36
+"""
+
+    def test_missing_resource_limits(self):
+        """Test that default resources are added to the end of the named container"""
+        vulnerability = {"type": "missing_resource_limits", "container": "sidecar"}
+
+        assert rules.try_fix(vulnerability, DEPLOYMENT_POD, FILES) == """\
+--- a/k8s/web.yaml
++++ b/k8s/web.yaml
+@@ -13,3 +13,10 @@
+             privileged: true
+         - name: sidecar
+           image: busybox:1.36
++          resources:
++            limits:
++              cpu: 500m
++              memory: 256Mi
++            requests:
++              cpu: 100m
++              memory: 128Mi
+"""
+
+    def test_missing_resource_limits_compact_list(self):
+        """Test that containers listed at their key's indentation are found"""
+        vulnerability = {"type": "missing_resource_limits", "container": "shell"}
+
+        assert rules.try_fix(vulnerability, POD_NODE, FILES) == """\
+--- a/k8s/debug.yaml
++++ b/k8s/debug.yaml
+@@ -6,3 +6,10 @@
+   containers:
+   - name: shell
+     image: busybox:1.36
++    resources:
++      limits:
++        cpu: 500m
++        memory: 256Mi
++      requests:
++        cpu: 100m
++        memory: 128Mi
+"""
+
+    def test_host_network(self):
+        """Test that a pod-level host namespace flag is switched off"""
+        vulnerability = {"type": "host_network"}
+
+        assert rules.try_fix(vulnerability, DEPLOYMENT_POD, FILES) == """\
+--- a/k8s/web.yaml
++++ b/k8s/web.yaml
+@@ -5,7 +5,7 @@
+ spec:
+   template:
+     spec:
+-      hostNetwork: true
++      hostNetwork: false
+       containers:
+         - name: web
+           image: nginx:1.27
+"""
+
+    def test_automounted_sa_token(self):
+        """Test that automountServiceAccountToken is added to the pod spec"""
+        vulnerability = {"type": "automounted_sa_token"}
+
+        assert rules.try_fix(vulnerability, POD_NODE, FILES) == """\
+--- a/k8s/debug.yaml
++++ b/k8s/debug.yaml
+@@ -3,6 +3,7 @@
+ metadata:
+   name: debug
+ spec:
++  automountServiceAccountToken: false
+   containers:
+   - name: shell
+     image: busybox:1.36
+"""
+
+    def test_no_rule_matches(self):
+        """Test that findings the rules can't fix are left to Gemini"""
+        # No rule for the vulnerability type
+        assert rules.try_fix({"type": "rbac_wildcard"}, DEPLOYMENT_POD, FILES) is None
+        # Flag isn't set, so there is nothing to switch off
+        assert rules.try_fix({"type": "host_pid"}, POD_NODE, FILES) is None
+        # Container not in the manifest
+        assert rules.try_fix({"type": "privileged_container", "container": "db"}, DEPLOYMENT_POD, FILES) is None
+        # No manifest defines the workload
+        assert rules.try_fix({"type": "host_network"}, {"label": "api", "type": "pod"}, FILES) is None
+
+    def test_partial_resources_not_templated(self):
+        """Test that containers with some resources configured are not patched"""
+        files = [("web.yaml", DEPLOYMENT.replace(
+            "          image: busybox:1.36\n",
+            "          image: busybox:1.36\n          resources:\n            requests:\n              cpu: 50m\n",
+        ))]
+        vulnerability = {"type": "missing_resource_limits", "container": "sidecar"}
+
+        assert rules.try_fix(vulnerability, DEPLOYMENT_POD, files) is None
+
+    def test_ambiguous_workload(self):
+        """Test that a workload defined in several manifests is left to Gemini"""
+        files = FILES + [("overlays/web.yaml", DEPLOYMENT)]
+        vulnerability = {"type": "privileged_container", "container": "web"}
+
+        assert rules.try_fix(vulnerability, DEPLOYMENT_POD, files) is None
@@ -55,6 +55,7 @@ class TestClusterScanner:
 
             mock_pods = Mock()
             mock_pods.items = [mock_pod]
+            mock_pods.metadata._continue = None
             scanner.v1_api.list_pod_for_all_namespaces = Mock(
                 return_value=mock_pods
             )
@@ -83,6 +84,222 @@ class TestClusterScanner:
             assert "error" in result
             assert result["count"] == 0
 
+    def test_scan_lists_pods_once(self):
+        """Test that a full scan shares one pod list between the pod scans"""
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir="/tmp/test_output")
+            scanner.v1_api = Mock()
+            scanner.rbac_api = Mock()
+            scanner.networking_api = Mock()
+            scanner.v1_api.list_pod_for_all_namespaces.return_value = Mock(
+                items=[], metadata=Mock(_continue=None)
+            )
+
+            result = scanner.scan()
+
+            assert scanner.v1_api.list_pod_for_all_namespaces.call_count == 1
+            # System namespaces are filtered out by the API server
+            selector = scanner.v1_api.list_pod_for_all_namespaces.call_args.kwargs["field_selector"]
+            assert "metadata.namespace!=kube-system" in selector
+            assert result["scans"]["container_security"]["success"] == True
+            assert result["scans"]["image_security"]["success"] == True
+
+    def test_failed_scan_reports_last_result(self):
+        """Test that a failing scan falls back to its last successful result"""
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir="/tmp/test_output")
+            scanner.v1_api = Mock()
+            scanner.rbac_api = Mock()
+            scanner.networking_api = Mock()
+            scanner.rbac_api.list_cluster_role.return_value = Mock(
+                items=[], metadata=Mock(_continue=None)
+            )
+            scanner.scan()
+
+            scanner.rbac_api.list_cluster_role.side_effect = Exception("API Error")
+            result = scanner.scan()["scans"]["rbac_wildcards"]
+
+            assert result["success"] == True
+            assert result["stale"] == True
+            assert result["error"] == "API Error"
+
+    def test_suspicious_volume_reported_once_per_pod(self):
+        """Test that a pod's suspicious volume is one finding, however many containers the pod has"""
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir="/tmp/test_output")
+            scanner.v1_api = Mock()
+            empty = Mock(items=[], metadata=Mock(_continue=None))
+            scanner.v1_api.list_config_map_for_all_namespaces.return_value = empty
+            scanner.v1_api.list_secret_for_all_namespaces.return_value = empty
+
+            mock_pod = Mock()
+            mock_pod.metadata.namespace = "default"
+            mock_pod.metadata.name = "web"
+            mock_pod.spec.containers = [Mock(env=None) for _ in range(3)]
+            mock_pod.spec.volumes = [
+                Mock(secret=Mock(), config_map=None),
+                Mock(secret=None, config_map=None),
+            ]
+            mock_pod.spec.volumes[0].name = "db-password"
+            mock_pod.spec.volumes[1].name = "token-cache"
+
+            result = scanner.scan_secrets(pods=[mock_pod])
+
+            volumes = [f for f in result["findings"] if f["type"] == "suspicious_volume"]
+            assert len(volumes) == 1
+            assert volumes[0]["resource"] == "default/pod/web"
+
+    def test_saved_files_keep_readable_mode(self, tmp_path):
+        """Test that atomically replaced files are not left readable by their owner only"""
+        import os
+        import stat
+        import vulnerability_state
+        from scanner.cluster_scanner import ClusterScanner
+
+        def mode(path):
+            return stat.S_IMODE(os.stat(path).st_mode)
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir=str(tmp_path))
+            assert scanner.save_graph({"nodes": [], "links": []}) == True
+            assert mode(scanner.graph_file) == 0o644
+
+            # An existing file keeps the mode it was given
+            os.chmod(scanner.graph_file, 0o640)
+            assert scanner.save_graph({"nodes": [], "links": []}) == True
+            assert mode(scanner.graph_file) == 0o640
+
+        state_file = tmp_path / "vulnerability_states.json"
+        with patch.object(vulnerability_state, "STATE_FILE", state_file):
+            vulnerability_state.save_states({})
+            assert mode(state_file) == 0o644
+
+    def test_list_follows_continue_tokens(self):
+        """Test that direct lists are fetched in pages"""
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir="/tmp/test_output")
+            list_func = Mock(side_effect=[
+                Mock(items=["a", "b"], metadata=Mock(_continue="next", resource_version="10")),
+                Mock(items=["c"], metadata=Mock(_continue=None, resource_version="10")),
+            ])
+
+            items = scanner._list("services", list_func, field_selector="x")
+
+            assert items == ["a", "b", "c"]
+            assert list_func.call_args_list[1].kwargs == {
+                "limit": 500,
+                "_headers": {"Accept-Encoding": "gzip"},
+                "field_selector": "x",
+                "_continue": "next",
+            }
+
+    def test_scans_read_from_resource_cache(self):
+        """Test that scans use the watch cache instead of listing when it is running"""
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir="/tmp/test_output")
+            scanner.v1_api = Mock()
+
+            mock_pod = Mock()
+            mock_pod.metadata.namespace = "default"
+            mock_pod.metadata.name = "test-pod"
+            mock_pod.spec.service_account_name = None
+            mock_pod.spec.automount_service_account_token = False
+            scanner.resource_cache = Mock()
+            scanner.resource_cache.items.return_value = [mock_pod]
+
+            result = scanner.scan_serviceaccount_security()
+
+            scanner.resource_cache.items.assert_called_once_with("pods")
+            scanner.v1_api.list_pod_for_all_namespaces.assert_not_called()
+            assert result["findings"][0]["pod_name"] == "test-pod"
+
+    def test_pod_metrics_listed_once(self):
+        """Test that pod metrics come from a single cluster-wide list"""
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = ClusterScanner(output_dir="/tmp/test_output")
+            scanner.metrics_api = Mock()
+            scanner.metrics_api.list_cluster_custom_object.return_value = {
+                "items": [
+                    {
+                        "metadata": {"namespace": "default", "name": "web-1"},
+                        "containers": [{"name": "web", "usage": {"cpu": "5m", "memory": "10Mi"}}],
+                    }
+                ]
+            }
+
+            metrics = scanner.get_pod_metrics("default", "web-1")
+
+            assert metrics["containers"][0]["usage"] == {"cpu": "5m", "memory": "10Mi"}
+            assert scanner.get_pod_metrics("default", "web-2") is None
+            assert scanner.metrics_api.list_cluster_custom_object.call_count == 1
+
+
+class TestResourceCache:
+    """Tests for the watch-backed resource cache"""
+
+    def test_stop_ends_blocked_watch(self):
+        """Test that stop() ends an informer thread waiting on a quiet watch"""
+        import socket
+        import threading
+        import time
+        import urllib3
+        from scanner.resource_cache import ResourceCache
+
+        # An API server that accepts the watch and then never sends an event
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        connections = []
+
+        def serve():
+            connection, _ = server.accept()
+            connection.recv(65536)
+            connection.sendall(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+            connections.append(connection)
+
+        threading.Thread(target=serve, daemon=True).start()
+        http = urllib3.PoolManager()
+
+        def list_pods(**kwargs):
+            """
+            :return: V1PodList
+            """
+            if kwargs.get("watch"):
+                return http.request(
+                    "GET", f"http://127.0.0.1:{server.getsockname()[1]}/", preload_content=False
+                )
+            return Mock(items=[], metadata=Mock(resource_version="1"))
+
+        cache = ResourceCache({"pods": (list_pods, {})})
+        cache.start()
+        informer = cache._informers["pods"]
+        for _ in range(100):
+            if informer._response is not None:
+                break
+            time.sleep(0.05)
+        assert informer._response is not None
+
+        started = time.monotonic()
+        cache.stop()
+
+        assert not cache._threads[0].is_alive()
+        assert time.monotonic() - started < 2
+        server.close()
+        for connection in connections:
+            connection.close()
+
 
 class TestGraphBuilder:
     """Tests for ClusterGraphBuilder class"""
@@ -130,6 +347,10 @@ class TestGraphBuilder:
             scanner.v1_api.list_namespaced_config_map.return_value = Mock(items=[])
             scanner.v1_api.list_namespaced_secret.return_value = Mock(items=[])
             scanner.apps_api.list_namespaced_deployment.return_value = Mock(items=[])
+            scanner.v1_api.list_pod_for_all_namespaces.return_value = Mock(items=[])
+            scanner.v1_api.list_service_for_all_namespaces.return_value = Mock(items=[
+                Mock(metadata=Mock(namespace=namespace)) for namespace in ("default", "default", "other")
+            ])
 
             builder = ClusterGraphBuilder(scanner)
             builder.add_namespace_nodes()
@@ -138,6 +359,7 @@ class TestGraphBuilder:
             assert builder.nodes[0]["id"] == "ns-default"
             assert builder.nodes[0]["type"] == "namespace"
             assert builder.nodes[0]["status"] == "Active"
+            assert builder.nodes[0]["resource_count"]["services"] == 2
 
     def test_build_graph_structure(self):
         """Test that build_graph returns correct structure"""
@@ -165,6 +387,25 @@ class TestGraphBuilder:
             assert isinstance(graph["nodes"], list)
             assert isinstance(graph["links"], list)
 
+    def test_build_graph_lists_pods_once(self):
+        """Test that the graph steps share one pod and service list"""
+        from scanner.graph_builder import ClusterGraphBuilder
+        from scanner.cluster_scanner import ClusterScanner
+
+        with patch("scanner.cluster_scanner.config"):
+            scanner = Mock(spec=ClusterScanner)
+            scanner.v1_api = Mock()
+
+            scanner.v1_api.list_namespace.return_value = Mock(items=[])
+            scanner.v1_api.list_node.return_value = Mock(items=[])
+            scanner.v1_api.list_pod_for_all_namespaces.return_value = Mock(items=[])
+            scanner.v1_api.list_service_for_all_namespaces.return_value = Mock(items=[])
+
+            ClusterGraphBuilder(scanner).build_graph()
+
+            assert scanner.v1_api.list_pod_for_all_namespaces.call_count == 1
+            assert scanner.v1_api.list_service_for_all_namespaces.call_count == 1
+
     def test_node_id_format(self):
         """Test that node IDs follow correct format"""
         from scanner.graph_builder import ClusterGraphBuilder
@@ -243,6 +484,88 @@ class TestAPIEndpoints:
         assert "nodes" in expected_structure["data"]
         assert "links" in expected_structure["data"]
 
+    def test_first_vulnerability(self):
+        """Test that the deprecated fix endpoint takes the head of the scan report"""
+        import main
+
+        graph = {
+            "nodes": [
+                {"id": "ns-default", "label": "default", "type": "namespace"},
+                {
+                    "id": "pod-default-web-1",
+                    "label": "web-1",
+                    "type": "pod",
+                    "namespace": "default",
+                    "vulnerabilities": [{"id": "vuln-1"}, {"id": "vuln-2"}],
+                },
+            ],
+        }
+
+        vulnerability, node_info = main._first_vulnerability(main._index_vulnerabilities(graph))
+        assert vulnerability["id"] == "vuln-1"
+        assert node_info._asdict() == {
+            "id": "pod-default-web-1",
+            "label": "web-1",
+            "type": "pod",
+            "namespace": "default",
+        }
+        assert main._first_vulnerability({}) == (None, None)
+
+    def test_first_vulnerability_skips_touched(self):
+        """Test that with states given, vulnerabilities a fix already touched are skipped"""
+        import main
+
+        graph = {
+            "nodes": [
+                {"id": "pod-default-web-1", "label": "web-1", "type": "pod",
+                 "vulnerabilities": [{"id": "vuln-1"}, {"id": "vuln-2"}, {"id": "vuln-3"}]},
+            ],
+        }
+        index = main._index_vulnerabilities(graph)
+        states = {"vuln-1": {"state": "pr_available"}, "vuln-2": {"state": "in_processing"}}
+
+        assert main._first_vulnerability(index, states)[0]["id"] == "vuln-3"
+        assert main._first_vulnerability(index, {})[0]["id"] == "vuln-1"
+        states["vuln-3"] = {"state": "pr_available"}
+        assert main._first_vulnerability(index, states) == (None, None)
+
+    @pytest.mark.asyncio
+    async def test_graph_watcher_publishes_new_report(self, tmp_path):
+        """Test that the watcher loads a rewritten scan report into the graph cache"""
+        import asyncio
+        import main
+        from scanner.cluster_scanner import _write_atomic
+
+        graph_file = tmp_path / "cluster_graph.json"
+        graph_file.write_text(json.dumps({"nodes": [], "links": []}))
+
+        with patch.object(main, "GRAPH_OUTPUT_FILE", graph_file), \
+             patch.object(main, "_graph_cache", None), \
+             patch.object(main, "_graph_cache_lock", None), \
+             patch.object(main, "_graph_watched", False):
+            task = asyncio.create_task(main._watch_graph())
+            try:
+                async def wait_for(condition):
+                    for _ in range(200):
+                        if condition():
+                            return
+                        await asyncio.sleep(0.05)
+                    raise AssertionError("condition not met")
+
+                await wait_for(lambda: main._graph_watched)
+                assert main._graph_cache.data["nodes"] == []
+
+                node = {"id": "pod-web", "vulnerabilities": [{"id": "vuln-1"}]}
+                _write_atomic(graph_file, json.dumps({"nodes": [node], "links": []}).encode())
+
+                await wait_for(lambda: main._graph_cache.data["nodes"] == [node])
+                assert "vuln-1" in main._graph_cache.index
+                assert (await main._get_graph())["nodes"] == [node]
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            assert not main._graph_watched
+
 
 class TestIntegration:
     """Integration tests for full workflow"""
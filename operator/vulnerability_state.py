@@ -8,8 +8,12 @@ Manages the state of vulnerabilities through their lifecycle:
 """
 
 import json
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Literal, Optional
+from typing import Dict, Any, Iterator, Literal, Optional
 from datetime import datetime, timezone
 
 VulnerabilityState = Literal["untouched", "in_processing", "pr_available"]
@@ -53,9 +57,23 @@ def save_states(states: Dict[str, Dict[str, Any]]) -> None:
     Args:
         states: Dictionary of vulnerability states
     """
-    _ensure_state_file()
-    with open(STATE_FILE, "w") as f:
-        json.dump(states, f, indent=2)
+    # Written next to the state file and renamed over it, so readers in other
+    # workers never load a half-written file (which would read as no states)
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=STATE_FILE.parent, prefix=f".{STATE_FILE.name}.")
+    try:
+        # mkstemp creates the file 0600; keep the mode of the file it replaces
+        try:
+            mode = stat.S_IMODE(os.stat(STATE_FILE).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "w") as f:
+            json.dump(states, f, indent=2)
+        os.replace(tmp_path, STATE_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 def get_vulnerability_state(vuln_id: str) -> Dict[str, Any]:
@@ -103,6 +121,54 @@ def update_vulnerability_state(
     return state_info
 
 
+class VulnerabilityTransition:
+    """The state a vulnerability ends up in once its fix is done."""
+
+    def __init__(self, vuln_id: Optional[str]):
+        self.vuln_id = vuln_id
+        self.state: VulnerabilityState = "untouched"
+        self.pr_url: Optional[str] = None
+
+    def set(self, state: VulnerabilityState, pr_url: Optional[str] = None) -> None:
+        """
+        Choose the final state, written when the transition ends.
+
+        Args:
+            state: The new state ("untouched", "in_processing", "pr_available")
+            pr_url: Optional PR URL (required for "pr_available" state)
+        """
+        self.state = state
+        self.pr_url = pr_url
+
+
+@contextmanager
+def vulnerability_transition(vuln_id: Optional[str]) -> Iterator[VulnerabilityTransition]:
+    """
+    Mark a vulnerability as in_processing while a fix runs.
+
+    The final state chosen with set() is written once on exit. Without one,
+    or if the block raises, the vulnerability goes back to untouched, so it
+    never stays in_processing. A missing vuln_id makes this a no-op.
+
+    Args:
+        vuln_id: The vulnerability ID
+
+    Yields:
+        The transition to set the final state on
+    """
+    transition = VulnerabilityTransition(vuln_id)
+    if vuln_id:
+        update_vulnerability_state(vuln_id, "in_processing")
+    try:
+        yield transition
+    except BaseException:
+        transition.set("untouched")
+        raise
+    finally:
+        if vuln_id:
+            update_vulnerability_state(vuln_id, transition.state, pr_url=transition.pr_url)
+
+
 def get_all_states() -> Dict[str, Dict[str, Any]]:
     """
     Get all vulnerability states.